@@ -0,0 +1,11 @@
+from django.contrib import admin
+
+# Imported with the root URLconf, or on the first request under /admin/ with
+# LAZY_URLCONFS, in which case the ModelAdmins are only discovered now.
+admin.autodiscover()
+
+admin.site.site_header = 'Fusrniture Store Admin'
+admin.site.index_title = 'Admin'
+
+app_name = 'admin'
+urlpatterns = admin.site.get_urls()
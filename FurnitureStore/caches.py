@@ -0,0 +1,14 @@
+from django.core.cache import caches
+from django.core.cache.backends.db import DatabaseCache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.memcached import BaseMemcachedCache
+from django.core.cache.backends.redis import RedisCache
+
+# Cache backends seen by every worker process. Invalidations written to the
+# local memory cache only reach the process that made them, so caches that
+# must never serve revoked state are skipped with it.
+SHARED_BACKENDS = (RedisCache, BaseMemcachedCache, DatabaseCache, FileBasedCache)
+
+
+def is_shared(alias='default'):
+    return isinstance(caches[alias], SHARED_BACKENDS)
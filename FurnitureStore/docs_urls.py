@@ -0,0 +1,7 @@
+from django.urls import path
+from .schema import SchemaView
+
+urlpatterns = [
+    path('', SchemaView.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
+    path('redoc/', SchemaView.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
+]
@@ -0,0 +1,118 @@
+import copy
+import gzip
+import os
+import threading
+from urllib.parse import urlsplit
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from drf_yasg import openapi
+from drf_yasg.codecs import OpenAPICodecJson
+from drf_yasg.generators import OpenAPISchemaGenerator
+from drf_yasg.renderers import OpenAPIRenderer, SwaggerJSONRenderer, _SpecRenderer
+from drf_yasg.views import get_schema_view
+from rest_framework import permissions
+from rest_framework.response import Response
+
+# The OpenAPI document is generated once by `manage.py build_schema` into
+# SCHEMA_FILE (plus a gzipped copy) and served from there. Without the file
+# the schema is generated on the first request and kept for the life of the
+# process, per URLconf and version; the host and scheme of each request are
+# filled in when it is served.
+
+info = openapi.Info(
+    title="Asrat Furniture Store API",
+    default_version='v1',
+)
+
+
+def schema_file():
+    return getattr(settings, 'SCHEMA_FILE', os.path.join(settings.BASE_DIR, 'openapi.json'))
+
+
+def generate_schema(request=None, url=None, version=''):
+    generator = OpenAPISchemaGenerator(info, version, url=url)
+    return generator.get_schema(request, public=True)
+
+
+def encode_schema(schema):
+    return OpenAPICodecJson(validators=[]).encode(schema)
+
+
+def write_schema(schema, path=None):
+    """Write the JSON schema and a gzipped copy next to it. Returns the sizes."""
+    path = path or schema_file()
+    content = encode_schema(schema)
+    compressed = gzip.compress(content, compresslevel=9, mtime=0)
+    for name, data in ((path, content), (path + '.gz', compressed)):
+        temporary = name + '.tmp'
+        with open(temporary, 'wb') as file:
+            file.write(data)
+        os.replace(temporary, name)
+    return len(content), len(compressed)
+
+
+_lock = threading.Lock()
+_built = {}
+_generated = {}
+
+
+def built_schema(gzipped):
+    """The content of the built schema file, or None when there is none."""
+    path = schema_file() + ('.gz' if gzipped else '')
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return None
+    if path not in _built or _built[path][0] != mtime:
+        with open(path, 'rb') as file:
+            _built[path] = (mtime, file.read())
+    return _built[path][1]
+
+
+BaseSchemaView = get_schema_view(
+    info,
+    public=True,
+    permission_classes=(permissions.AllowAny,),
+)
+
+
+class SchemaView(BaseSchemaView):
+    """Serves the built schema file, or a schema generated once per process."""
+
+    def get(self, request, version='', format=None):
+        renderer = request.accepted_renderer
+        if isinstance(renderer, (OpenAPIRenderer, SwaggerJSONRenderer)):
+            response = self.built_response(request, renderer)
+            if response is not None:
+                return response
+        if not isinstance(renderer, _SpecRenderer):
+            # The UI pages only need the title and version; they fetch the
+            # document itself with a second request.
+            return super().get(request, version, format)
+
+        version = request.version or version or ''
+        key = (getattr(request, 'urlconf', None) or settings.ROOT_URLCONF, version)
+        if key not in _generated:
+            with _lock:
+                if key not in _generated:
+                    _generated[key] = generate_schema(request, version=version)
+        schema = copy.copy(_generated[key])
+        url = urlsplit(request.build_absolute_uri('/'))
+        schema.host = url.netloc
+        schema.schemes = [url.scheme]
+        return Response(schema)
+
+    def built_response(self, request, renderer):
+        gzipped = 'gzip' in request.headers.get('Accept-Encoding', '')
+        content = built_schema(gzipped)
+        if content is None and gzipped:
+            gzipped = False
+            content = built_schema(False)
+        if content is None:
+            return None
+        response = HttpResponse(content, content_type=f'{renderer.media_type}; charset=utf-8')
+        if gzipped:
+            response['Content-Encoding'] = 'gzip'
+        patch_vary_headers(response, ['Accept-Encoding'])
+        return response
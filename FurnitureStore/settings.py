@@ -33,8 +33,13 @@ ALLOWED_HOSTS = ['*']
 
 # Application definition
 
+# Production startup mode: defer importing the admin, the API docs and djoser
+# until they are first requested, and run the URL checks with `check --deploy`
+# only. Compare with `manage.py profile_startup --compare`.
+LAZY_URLCONFS = config('LAZY_URLCONFS', default=False, cast=bool)
+
 INSTALLED_APPS = [
-    'django.contrib.admin',
+    'django.contrib.admin.apps.SimpleAdminConfig' if LAZY_URLCONFS else 'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
@@ -51,6 +56,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    'Store.middleware.LoadSheddingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -130,6 +136,19 @@ STATIC_URL = 'static/'
 MEDIA_URL = 'media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media') 
+
+# How MediaView hands files to the front proxy when DEBUG is off: 'nginx'
+# (X-Accel-Redirect to MEDIA_ACCEL_REDIRECT_PREFIX) or 'sendfile' (X-Sendfile)
+MEDIA_SENDFILE_BACKEND = config('MEDIA_SENDFILE_BACKEND', default='nginx')
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+
+# Size limits enforced while custom order images are streamed in
+IMAGE_UPLOAD_MAX_FILE_SIZE = 10 * 1024 * 1024
+IMAGE_UPLOAD_MAX_TOTAL_SIZE = 25 * 1024 * 1024
+# Resumable uploads a customer may have open at once, and the hours after
+# which an untouched one is deleted by the cart purge (`manage.py purge_carts`)
+IMAGE_UPLOAD_MAX_OPEN = 8
+IMAGE_UPLOAD_EXPIRY_HOURS = 24
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -138,11 +157,13 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 REST_FRAMEWORK = {
     'COERCE_DECIMAL_TO_STRING': False,
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'core.authentication.CachedJWTAuthentication',
     ),
-    'DEFAULT_SCHEMA_CLASS':'drf_spectacular.openapi.AutoSchema'
 }
 
+# Built by `manage.py build_schema` and served by the API docs when present
+SCHEMA_FILE = config('SCHEMA_FILE', default=str(BASE_DIR / 'openapi.json'))
+
 AUTH_USER_MODEL = 'core.User'
 
 DJOSER = {
@@ -157,8 +178,110 @@ DJOSER = {
 
 SIMPLE_JWT = {
     'AUTH_HEADER_TYPES': ('JWT',),
-    'ACCESS_TOKEN_LIFETIME': timedelta(days=1)
+    'ACCESS_TOKEN_LIFETIME': timedelta(days=1),
+    'TOKEN_OBTAIN_SERIALIZER': 'core.serializers.TokenObtainPairSerializer',
+}
+
+# The default cache also tells workers when to refresh their autocomplete
+# index and when permissions changed, so use a shared backend when running
+# several processes. With the local memory cache, JWT users and their
+# permissions are read from the database on every request.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Carts idle for longer than this, and empty wishlists older than it, are
+# deleted by `manage.py purge_carts`. Set CART_PURGE_INTERVAL (seconds) to
+# also run the purge periodically inside the process.
+CART_IDLE_TTL_DAYS = config('CART_IDLE_TTL_DAYS', default=30, cast=int)
+CART_PURGE_INTERVAL = config('CART_PURGE_INTERVAL', default=0, cast=int)
+
+# 'database' stores carts as Cart/CartItem rows. 'cache' keeps them in the
+# 'carts' cache and writes them to the database at checkout and, every
+# CART_FLUSH_INTERVAL seconds (or with `manage.py flush_carts`), for durability.
+# The 'cache' storage needs CART_CACHE_BACKEND to be
+# django.core.cache.backends.redis.RedisCache, except with DEBUG.
+CART_STORAGE = config('CART_STORAGE', default='database')
+CART_FLUSH_INTERVAL = config('CART_FLUSH_INTERVAL', default=300, cast=int)
+CACHES['carts'] = {
+    'BACKEND': config('CART_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+    'LOCATION': config('CART_CACHE_LOCATION', default='carts'),
+    'TIMEOUT': CART_IDLE_TTL_DAYS * 24 * 60 * 60,
 }
+if 'redis' not in CACHES['carts']['BACKEND']:
+    CACHES['carts']['OPTIONS'] = {'MAX_ENTRIES': 100000}
+
+# Products are low on stock below their own threshold, else their collection's,
+# else this one. Staff are emailed a digest of new low-stock products by
+# `manage.py low_stock_digest`, or every LOW_STOCK_DIGEST_INTERVAL seconds.
+LOW_STOCK_THRESHOLD = config('LOW_STOCK_THRESHOLD', default=10, cast=int)
+LOW_STOCK_DIGEST_INTERVAL = config('LOW_STOCK_DIGEST_INTERVAL', default=0, cast=int)
+
+# Upper bounds of the price ranges counted by `/store/products/?facets=1`
+# (overridable per request with ?price_buckets=), and how long the counts of
+# a given set of filters are cached.
+PRODUCT_PRICE_BUCKETS = [100, 250, 500, 1000]
+FACETS_CACHE_TIMEOUT = 300
+
+# Settled orders older than this are moved to the archive tables by
+# `manage.py archive_orders`.
+ORDER_ARCHIVE_AFTER_DAYS = config('ORDER_ARCHIVE_AFTER_DAYS', default=365, cast=int)
+
+# Responses to POST requests sent with an Idempotency-Key header are kept in
+# the default cache for this many seconds and replayed to retries. Retries
+# arriving while the first request runs get 409; a request that has not
+# finished after IDEMPOTENCY_LOCK_TIMEOUT seconds no longer holds its key.
+IDEMPOTENCY_KEY_TTL = 24 * 60 * 60
+IDEMPOTENCY_LOCK_TIMEOUT = 300
+
+# Concurrency budgets of Store.middleware.LoadSheddingMiddleware, per process.
+# A class admits up to its (adaptive) limit of requests at once, queues up to
+# max_queue more for at most queue_timeout seconds and answers the rest with
+# 503 + Retry-After. The limit shrinks when requests take longer than
+# target_latency seconds and grows back while they are faster.
+LOAD_SHEDDING_CLASSES = {
+    'checkout': {
+        'methods': ['POST'],
+        'paths': [r'^/store/orders/$'],
+        'initial_limit': 2, 'min_limit': 1, 'max_limit': 8,
+        'max_queue': 32, 'queue_timeout': 2.0, 'target_latency': 1.0,
+    },
+    'cart_writes': {
+        'methods': ['POST', 'PUT', 'PATCH', 'DELETE'],
+        'paths': [r'^/store/carts/'],
+        'initial_limit': 4, 'min_limit': 1, 'max_limit': 16,
+        'max_queue': 64, 'queue_timeout': 1.0, 'target_latency': 0.5,
+    },
+    'catalog_reads': {
+        'methods': ['GET', 'HEAD'],
+        'paths': [r'^/store/(async/)?(products|collections|autocomplete)/'],
+        'initial_limit': 16, 'min_limit': 4, 'max_limit': 64,
+        'max_queue': 128, 'queue_timeout': 0.5, 'target_latency': 0.3,
+    },
+}
+
+# Server-sent events of order payment status changes (/store/async/orders/events/,
+# ASGI only): streams are closed after MAX_AGE seconds and EventSource
+# reconnects; every RESYNC_INTERVAL seconds (0 to disable) the watched orders
+# are read back, for changes published by other processes
+ORDER_EVENTS_MAX_AGE = config('ORDER_EVENTS_MAX_AGE', default=600, cast=int)
+ORDER_EVENTS_RESYNC_INTERVAL = config('ORDER_EVENTS_RESYNC_INTERVAL', default=30, cast=int)
+
+# Seconds a user's permissions are kept in the default cache. Changes to group
+# memberships and user or group permissions take effect at once regardless.
+PERMISSION_CACHE_TIMEOUT = config('PERMISSION_CACHE_TIMEOUT', default=300, cast=int)
+
+# Processes hashing passwords for `manage.py provision_users`; 0 uses one per
+# CPU. The staff provisioning endpoint hashes in the web worker itself
+PROVISIONING_WORKERS = config('PROVISIONING_WORKERS', default=0, cast=int)
+
+# Number of "frequently bought together" products kept per product
+RELATED_PRODUCTS_TOP_K = 10
+
+# Seconds an authenticated user is kept in the cache by CachedJWTAuthentication
+JWT_USER_CACHE_TIMEOUT = 60
 
 
 EMAIL_BACKEND = config('EMAIL_BACKEND')
@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.urls import URLResolver, include, path
+from django.urls.resolvers import RoutePattern
+
+# Production startup mode (LAZY_URLCONFS). The admin, the API docs and djoser
+# are only imported when the first request is routed to them, the admin runs
+# without autodiscovery until then (SimpleAdminConfig), and the URL checks,
+# which would import every URLconf, only run with `manage.py check --deploy`.
+
+
+class LazyURLResolver(URLResolver):
+    """A resolver whose URLconf is imported on first use rather than at startup."""
+
+    def check(self):
+        if 'urlconf_module' not in self.__dict__:
+            return self.pattern.check()
+        return super().check()
+
+
+def include_urls(route, urlconf, app_name=None):
+    """
+    path(route, include(urlconf)). With LAZY_URLCONFS the module is imported
+    when a request under `route` is first resolved, so its namespace
+    (`app_name`) has to be given here.
+    """
+    if not getattr(settings, 'LAZY_URLCONFS', False):
+        return path(route, include(urlconf))
+    return LazyURLResolver(RoutePattern(route, is_endpoint=False), urlconf, app_name=app_name, namespace=app_name)
+
+
+def defer_url_checks():
+    """Run the URL checks with `manage.py check --deploy` only."""
+    from django.core.checks import urls
+    from django.core.checks.registry import registry
+
+    for check in (urls.check_url_config, urls.check_url_namespaces_unique):
+        registry.registered_checks.discard(check)
+        registry.deployment_checks.add(check)
@@ -15,38 +15,28 @@ Including another URLconf
 """
 from django.conf import settings
 from django.conf.urls.static import static
-from django.contrib import admin
-from django.urls import path, include
-from rest_framework import permissions
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
+from django.urls import path, include, re_path
+from Store.media import MediaView
+from .startup import include_urls
 
 
-schema_view = get_schema_view(
-   openapi.Info(
-      title="Asrat Furniture Store API",
-      default_version='v1',
-    #   description="Test description",
-    #   terms_of_service="https://www.google.com/policies/terms/",
-    #   contact=openapi.Contact(email="contact@snippets.local"),
-    #   license=openapi.License(name="BSD License"),
-   ),
-   public=True,
-   permission_classes=(permissions.AllowAny,),
-)
-
-admin.site.site_header = 'Fusrniture Store Admin'
-admin.site.index_title = 'Admin'
-
 urlpatterns = [
-    path('', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
-    path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
-    path('admin/', admin.site.urls),
+    include_urls('admin/', 'FurnitureStore.admin_urls', app_name='admin'),
     path('store/', include('Store.urls')),
-    path('auth/', include('djoser.urls')),
-    path('auth/', include('djoser.urls.jwt')),
+    include_urls('auth/', 'djoser.urls'),
+    include_urls('auth/', 'djoser.urls.jwt'),
 ] 
 
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL,document_root=settings.MEDIA_ROOT)
+else:
+    urlpatterns += [
+        re_path(r'^%s(?P<path>.+)$' % settings.MEDIA_URL.lstrip('/'), MediaView.as_view(), name='media'),
+    ]
+
+# Last, as its routes start at the root and a lazily included URLconf is
+# imported as soon as a path is resolved against it.
+urlpatterns += [
+    include_urls('', 'FurnitureStore.docs_urls'),
+]
 
@@ -1,10 +1,53 @@
 from django.contrib import admin, messages
+from django.contrib.admin.views.main import ChangeList
+from django.core.paginator import Paginator
+from django.db import connections
 from django.db.models.aggregates import Count
 from django.db.models.query import QuerySet
+from django.utils.functional import cached_property
 from django.utils.html import format_html, urlencode
 from django.urls import reverse
-from . import models
-
+from . import analytics, models
+from .signals import order_status_changed, products_changed
+
+
+class LargeTablePaginator(Paginator):
+    """
+    Paginator that never counts a whole large table. Unfiltered changelists use
+    the row estimate kept by PostgreSQL or MySQL, and the others count at most
+    MAX_COUNT rows, so pages past that are not linked. SQLite keeps no
+    estimate, so there the rows past the first MAX_COUNT of any list are only
+    reached by narrowing it with search or filters.
+    """
+    MAX_COUNT = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = self.estimate(queryset)
+            if estimate is not None and estimate > self.MAX_COUNT:
+                return estimate
+        return queryset.order_by().values('pk')[:self.MAX_COUNT].count()
+
+    def estimate(self, queryset):
+        connection = connections[queryset.db]
+        table = queryset.model._meta.db_table
+        if connection.vendor == 'postgresql':
+            sql = 'SELECT reltuples::bigint FROM pg_class WHERE relname = %s'
+        elif connection.vendor == 'mysql':
+            sql = 'SELECT table_rows FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s'
+        else:
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [table])
+            row = cursor.fetchone()
+        return int(row[0]) if row and row[0] is not None and row[0] >= 0 else None
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = LargeTablePaginator
+    show_full_result_count = False
 
 
 class InventoryFilter(admin.SimpleListFilter):
@@ -13,12 +56,12 @@ class InventoryFilter(admin.SimpleListFilter):
 
     def lookups(self, request, model_admin):
         return [
-            ('<10', 'Low')
+            ('low', 'Low')
         ]
 
     def queryset(self, request, queryset: QuerySet):
-        if self.value() == '<10':
-            return queryset.filter(inventory__lt=10)
+        if self.value() == 'low':
+            return queryset.filter(low_stock__isnull=False)
 
 class ProductImageInline(admin.TabularInline):
     model = models.ProductImage
@@ -31,13 +74,14 @@ class ProductImageInline(admin.TabularInline):
 
 
 @admin.register(models.CustomOrder)
-class CustomOrderAdmin(admin.ModelAdmin):
+class CustomOrderAdmin(LargeTableAdmin):
     list_display = ['order','ordered_by','placed_at']
+    list_select_related = ['customer__user']
     readonly_fields = ['ordered_by','order','placed_at']
 
 
 @admin.register(models.Product)
-class ProductAdmin(admin.ModelAdmin):
+class ProductAdmin(LargeTableAdmin):
     autocomplete_fields = ['collection']
     prepopulated_fields = {
         'slug': ['title']
@@ -61,9 +105,15 @@ class ProductAdmin(admin.ModelAdmin):
         return product.collection.title
 
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        products_changed.send(sender=models.Product, product_ids=[obj.pk])
+
     @admin.action(description='Clear inventory')
     def clear_inventory(self, request, queryset):
+        product_ids = list(queryset.values_list('id', flat=True))
         updated_count = queryset.update(inventory=0)
+        products_changed.send(sender=models.Product, product_ids=product_ids)
         self.message_user(
             request,
             f'{updated_count} products were successfully updated.',
@@ -95,16 +145,50 @@ class CollectionAdmin(admin.ModelAdmin):
             products_count=Count('products')
         )
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change and 'low_stock_threshold' in form.changed_data:
+            products_changed.send(
+                sender=models.Collection,
+                product_ids=obj.products.values_list('id', flat=True))
+
+
+@admin.register(models.LowStockProduct)
+class LowStockProductAdmin(admin.ModelAdmin):
+    list_display = ['product', 'inventory', 'threshold', 'since', 'notified_at']
+    list_select_related = ['product']
+    readonly_fields = ['product', 'inventory', 'threshold', 'since', 'notified_at']
+
+    def has_add_permission(self, request):
+        return False
+
+
+class OrdersCountChangeList(ChangeList):
+    """Counts the orders of the customers on the current page only, in one query."""
+
+    def get_results(self, request):
+        super().get_results(request)
+        counts = dict(models.Order.objects
+                      .filter(customer_id__in=[customer.id for customer in self.result_list])
+                      .values('customer_id')
+                      .annotate(count=Count('id'))
+                      .values_list('customer_id', 'count'))
+        for customer in self.result_list:
+            customer.orders_count = counts.get(customer.id, 0)
+
 
 @admin.register(models.Customer)
-class CustomerAdmin(admin.ModelAdmin):
+class CustomerAdmin(LargeTableAdmin):
     list_display = ['first_name', 'last_name', 'orders']
     list_per_page = 10
     list_select_related = ['user']
     ordering = ['user__first_name', 'user__last_name']
-    search_fields = ['first_name__istartswith', 'last_name__istartswith']
+    search_fields = ['user__first_name__istartswith', 'user__last_name__istartswith']
 
-    @admin.display(ordering='orders_count')
+    def get_changelist(self, request, **kwargs):
+        return OrdersCountChangeList
+
+    @admin.display(description='orders')
     def orders(self, customer):
         url = (
             reverse('admin:Store_order_changelist')
@@ -114,11 +198,6 @@ class CustomerAdmin(admin.ModelAdmin):
             }))
         return format_html('<a href="{}">{} Orders</a>', url, customer.orders_count)
 
-    def get_queryset(self, request):
-        return super().get_queryset(request).annotate(
-            orders_count=Count('orders')
-        )
-
 class OrderItemInline(admin.TabularInline):
     autocomplete_fields = ['product']
     min_num = 1
@@ -128,7 +207,43 @@ class OrderItemInline(admin.TabularInline):
 
 
 @admin.register(models.Order)
-class OrderAdmin(admin.ModelAdmin):
+class OrderAdmin(LargeTableAdmin):
     autocomplete_fields = ['customer']
     inlines = [OrderItemInline]
     list_display = ['id', 'placed_at', 'customer','payment_status']
+    list_select_related = ['customer__user']
+
+    def save_model(self, request, obj, form, change):
+        # Items are saved after the order, so the rollups are updated in
+        # save_related() from what the order contributed before the change.
+        obj.old_contribution = None
+        if change:
+            old = models.Order.objects.get(pk=obj.pk)
+            obj.old_contribution = analytics.OrderContribution.from_database(old)
+        super().save_model(request, obj, form, change)
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        order = form.instance
+        analytics.replace_order(order.old_contribution, analytics.OrderContribution.from_database(order))
+        if order.old_contribution and order.old_contribution.payment_status != order.payment_status:
+            order_status_changed.send(sender=models.Order, order_id=order.id, customer_id=order.customer_id,
+                                      payment_status=order.payment_status)
+
+
+class ArchivedOrderItemInline(admin.TabularInline):
+    model = models.ArchivedOrderItem
+    readonly_fields = ['product', 'quantity', 'unit_price']
+    extra = 0
+    can_delete = False
+
+
+@admin.register(models.ArchivedOrder)
+class ArchivedOrderAdmin(LargeTableAdmin):
+    inlines = [ArchivedOrderItemInline]
+    list_display = ['id', 'placed_at', 'customer', 'payment_status', 'archived_at']
+    list_select_related = ['customer__user']
+    readonly_fields = ['id', 'placed_at', 'customer', 'payment_status', 'archived_at']
+
+    def has_add_permission(self, request):
+        return False
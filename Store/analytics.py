@@ -0,0 +1,203 @@
+from collections import defaultdict
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from .db import bulk_upsert_add
+from .models import ArchivedOrderItem, DailyProductSales, DailySales, OrderItem
+
+# Daily sales rollups. Every change to an order adds its contribution to the
+# rows of its new state and subtracts it from the rows of its old state, so the
+# analytics endpoints read a few rows per day instead of aggregating orders.
+
+SUM_FIELDS = ['orders', 'quantity', 'revenue']
+
+
+def line_total():
+    return ExpressionWrapper(F('quantity') * F('unit_price'),
+                             output_field=DecimalField(max_digits=14, decimal_places=2))
+
+
+class OrderContribution:
+    """What one order adds to the rollups, per product."""
+
+    def __init__(self, day, payment_status, products):
+        self.day = day
+        self.payment_status = payment_status
+        # product_id -> (collection_id, quantity, revenue)
+        self.products = products
+
+    @classmethod
+    def from_items(cls, order, items):
+        products = defaultdict(lambda: [None, 0, Decimal(0)])
+        for item in items:
+            row = products[item.product_id]
+            row[0] = item.product.collection_id
+            row[1] += item.quantity
+            row[2] += item.quantity * item.unit_price
+        return cls(timezone.localdate(order.placed_at), order.payment_status,
+                   {product_id: tuple(row) for product_id, row in products.items()})
+
+    @classmethod
+    def from_database(cls, order):
+        rows = OrderItem.objects \
+            .filter(order_id=order.pk) \
+            .values('product_id', 'product__collection_id') \
+            .annotate(total_quantity=Sum('quantity'), total_revenue=Sum(line_total())) \
+            .values_list('product_id', 'product__collection_id', 'total_quantity', 'total_revenue')
+        return cls(timezone.localdate(order.placed_at), order.payment_status,
+                   {product_id: (collection_id, quantity, revenue)
+                    for product_id, collection_id, quantity, revenue in rows})
+
+    @classmethod
+    def for_orders(cls, orders):
+        """from_database() for each of `orders`, with a single query."""
+        products = defaultdict(dict)
+        rows = OrderItem.objects \
+            .filter(order_id__in=[order.pk for order in orders]) \
+            .values('order_id', 'product_id', 'product__collection_id') \
+            .annotate(total_quantity=Sum('quantity'), total_revenue=Sum(line_total())) \
+            .values_list('order_id', 'product_id', 'product__collection_id', 'total_quantity', 'total_revenue')
+        for order_id, product_id, collection_id, quantity, revenue in rows:
+            products[order_id][product_id] = (collection_id, quantity, revenue)
+        return [cls(timezone.localdate(order.placed_at), order.payment_status, products[order.pk]) for order in orders]
+
+    def revenue(self):
+        return sum((revenue for _, _, revenue in self.products.values()), Decimal(0))
+
+    def rows(self, sign, payment_status=None):
+        payment_status = payment_status or self.payment_status
+        quantity = 0
+        revenue = Decimal(0)
+        order_rows = []
+        product_rows = []
+        for product_id, (collection_id, product_quantity, product_revenue) in self.products.items():
+            quantity += product_quantity
+            revenue += product_revenue
+            product_rows.append({
+                'day': self.day, 'product_id': product_id, 'collection_id': collection_id,
+                'payment_status': payment_status, 'orders': sign,
+                'quantity': sign * product_quantity, 'revenue': sign * product_revenue,
+            })
+        if product_rows:
+            order_rows.append({
+                'day': self.day, 'payment_status': payment_status, 'orders': sign,
+                'quantity': sign * quantity, 'revenue': sign * revenue,
+            })
+        return order_rows, product_rows
+
+
+def merge(rows, key_fields):
+    """
+    Sum the rows that share a key, since one upsert statement may not update a
+    row twice (PostgreSQL), and leave out the rows that add nothing.
+    """
+    merged = {}
+    for row in rows:
+        key = tuple(row[name] for name in key_fields)
+        if key in merged:
+            for name in SUM_FIELDS:
+                merged[key][name] += row[name]
+        else:
+            merged[key] = dict(row)
+    return [row for row in merged.values() if any(row[name] for name in SUM_FIELDS)]
+
+
+def apply(*changes):
+    """Add each (order rows, product rows) change to the rollup tables."""
+    order_rows = [row for rows, _ in changes for row in rows]
+    product_rows = [row for _, rows in changes for row in rows]
+    emptied_days = {row['day'] for row in order_rows if row['orders'] < 0}
+    with transaction.atomic():
+        bulk_upsert_add(DailySales, merge(order_rows, ['day', 'payment_status']),
+                        ['day', 'payment_status'], SUM_FIELDS)
+        bulk_upsert_add(DailyProductSales, merge(product_rows, ['day', 'product_id', 'payment_status']),
+                        ['day', 'product', 'payment_status'], SUM_FIELDS)
+        # Drop the rows an order moved out of, so that a rebuild and the
+        # incremental updates leave the same tables.
+        if emptied_days:
+            DailySales.objects.filter(day__in=emptied_days, orders=0).delete()
+            DailyProductSales.objects.filter(day__in=emptied_days, orders=0).delete()
+
+
+def record_order(order, items):
+    """Add a new order, whose items (with their products) are given, to the rollups."""
+    apply(OrderContribution.from_items(order, items).rows(1))
+
+
+def replace_order(old, new: OrderContribution):
+    """Replace what an edited order contributed (None for a new order) with `new`."""
+    if old is None:
+        apply(new.rows(1))
+    else:
+        apply(old.rows(-1), new.rows(1))
+
+
+def move_order(order, old_payment_status):
+    """Move an order whose payment status changed to the rows of its new status."""
+    if old_payment_status == order.payment_status:
+        return
+    contribution = OrderContribution.from_database(order)
+    apply(contribution.rows(-1, old_payment_status), contribution.rows(1))
+
+
+def move_contributions(contributions, payment_status):
+    """Move what orders contributed, read before their status changed, to the rows of `payment_status`."""
+    changes = []
+    for contribution in contributions:
+        changes += [contribution.rows(-1), contribution.rows(1, payment_status)]
+    apply(*changes)
+
+
+def aggregate_items(model):
+    """Daily totals and daily product totals of the order lines in `model`."""
+    items = model.objects.annotate(
+        day=TruncDate('order__placed_at'),
+        payment_status=F('order__payment_status'),
+    )
+    daily = items \
+        .values('day', 'payment_status') \
+        .annotate(total_orders=Count('order_id', distinct=True), total_quantity=Sum('quantity'),
+                  total_revenue=Sum(line_total())) \
+        .order_by()
+    daily_products = items \
+        .values('day', 'product_id', 'payment_status') \
+        .annotate(collection_id=F('product__collection_id'), total_orders=Count('order_id', distinct=True),
+                  total_quantity=Sum('quantity'), total_revenue=Sum(line_total())) \
+        .order_by()
+    return daily, daily_products
+
+
+def add_totals(totals, key, row):
+    current = totals.get(key, (0, 0, Decimal(0)))
+    totals[key] = (current[0] + row['total_orders'], current[1] + row['total_quantity'],
+                   current[2] + row['total_revenue'])
+
+
+def rebuild(batch_size=5000):
+    """Recompute both rollup tables from every order, archived ones included."""
+    daily_totals = {}
+    product_totals = {}
+    for model in (OrderItem, ArchivedOrderItem):
+        # An order is either live or archived, so the distinct order counts
+        # of the two tables add up.
+        daily, daily_products = aggregate_items(model)
+        for row in daily.iterator(chunk_size=batch_size):
+            add_totals(daily_totals, (row['day'], row['payment_status']), row)
+        for row in daily_products.iterator(chunk_size=batch_size):
+            add_totals(product_totals, (row['day'], row['product_id'], row['collection_id'], row['payment_status']), row)
+
+    with transaction.atomic():
+        DailySales.objects.all().delete()
+        DailyProductSales.objects.all().delete()
+        DailySales.objects.bulk_create(
+            [DailySales(day=day, payment_status=payment_status, orders=orders, quantity=quantity, revenue=revenue)
+             for (day, payment_status), (orders, quantity, revenue) in daily_totals.items()],
+            batch_size=batch_size)
+        DailyProductSales.objects.bulk_create(
+            [DailyProductSales(day=day, product_id=product_id, collection_id=collection_id,
+                               payment_status=payment_status, orders=orders, quantity=quantity, revenue=revenue)
+             for (day, product_id, collection_id, payment_status), (orders, quantity, revenue)
+             in product_totals.items()],
+            batch_size=batch_size)
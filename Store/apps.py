@@ -6,4 +6,11 @@ class StoreConfig(AppConfig):
     name = 'Store'
 
     def ready(self) -> None:
+        import Store.checks
         import Store.signals.handlers
+        from django.conf import settings
+        if settings.LAZY_URLCONFS:
+            from FurnitureStore.startup import defer_url_checks
+            defer_url_checks()
+        from Store.maintenance import start_scheduler
+        start_scheduler()
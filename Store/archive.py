@@ -0,0 +1,59 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .models import ArchivedOrder, ArchivedOrderItem, Order, OrderItem
+
+# Orders older than ORDER_ARCHIVE_AFTER_DAYS whose payment is settled are moved
+# with their items to ArchivedOrder and ArchivedOrderItem, keeping their ids,
+# so Order and OrderItem only hold the recent orders that nearly every read
+# is about.
+
+
+def archive_horizon():
+    """Orders placed before this may be in the archive."""
+    return timezone.now() - timedelta(days=settings.ORDER_ARCHIVE_AFTER_DAYS)
+
+
+def archivable_orders(cutoff):
+    return Order.objects \
+        .filter(placed_at__lt=cutoff) \
+        .exclude(payment_status=Order.PAYMENT_STATUS_PENDING)
+
+
+def archive_batch(order_ids):
+    with transaction.atomic():
+        orders = list(Order.objects.select_for_update().filter(pk__in=order_ids))
+        items = list(OrderItem.objects.filter(order_id__in=order_ids))
+        ArchivedOrder.objects.bulk_create([
+            ArchivedOrder(id=order.id, placed_at=order.placed_at, payment_status=order.payment_status,
+                          customer_id=order.customer_id)
+            for order in orders
+        ])
+        ArchivedOrderItem.objects.bulk_create([
+            ArchivedOrderItem(order_id=item.order_id, product_id=item.product_id, quantity=item.quantity,
+                              unit_price=item.unit_price)
+            for item in items
+        ])
+        OrderItem.objects.filter(order_id__in=order_ids).delete()
+        Order.objects.filter(pk__in=order_ids).delete()
+    return len(orders)
+
+
+def archive_orders(cutoff=None, batch_size=500, dry_run=False):
+    """
+    Move settled orders placed before `cutoff` to the archive, `batch_size`
+    orders per transaction. Returns the number of (archivable) orders.
+    """
+    if cutoff is None:
+        cutoff = archive_horizon()
+    orders = archivable_orders(cutoff)
+    if dry_run:
+        return orders.count()
+
+    archived = 0
+    while True:
+        order_ids = list(orders.order_by('id').values_list('id', flat=True)[:batch_size])
+        if not order_ids:
+            return archived
+        archived += archive_batch(order_ids)
@@ -0,0 +1,295 @@
+import asyncio
+from decimal import Decimal
+from functools import wraps
+from asgiref.sync import sync_to_async
+from core.authentication import CachedJWTAuthentication, get_customer_id
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Q
+from django.db.models.aggregates import Count
+from django.http import HttpResponse, HttpResponseNotAllowed, StreamingHttpResponse
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.renderers import JSONRenderer
+from rest_framework_simplejwt.exceptions import InvalidToken
+from . import events
+from .filters import ProductFilter
+from .models import Collection, Customer, Order, Product, ProductImage
+from .pagination import DefaultPagination
+
+# Native async counterparts of the read-only catalog endpoints.  They mirror the
+# payloads of ProductViewSet, CollectionViewSet and ProductImageViewSet but use
+# the async ORM directly, so under ASGI no request pays a sync_to_async hop.
+
+PRODUCT_SEARCH_FIELDS = ['title', 'description']
+PRODUCT_ORDERING_FIELDS = ['unit_price', 'last_update']
+
+
+def read_only(view):
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return HttpResponseNotAllowed(['GET', 'HEAD'])
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+def render(data, status=200):
+    return HttpResponse(JSONRenderer().render(data), status=status, content_type='application/json')
+
+
+def not_found():
+    return render({'detail': 'Not found.'}, status=404)
+
+
+def file_url(field, request=None):
+    if not field:
+        return None
+    url = field.url
+    if request is not None:
+        return request.build_absolute_uri(url)
+    return url
+
+
+def serialize_image(image: ProductImage, request=None):
+    return {'id': image.id, 'image': file_url(image.image, request)}
+
+
+def serialize_product(product: Product, images, request):
+    return {
+        'id': product.id,
+        'title': product.title,
+        'description': product.description,
+        'slug': product.slug,
+        'inventory': product.inventory,
+        'unit_price': product.unit_price,
+        'price_with_tax': product.unit_price * Decimal(1.1),
+        'collection': product.collection_id,
+        'cover_image': file_url(product.cover_image, request),
+        'images': [serialize_image(image, request) for image in images],
+    }
+
+
+async def images_by_product(product_ids):
+    images = {product_id: [] for product_id in product_ids}
+    async for image in ProductImage.objects.filter(product_id__in=product_ids).order_by('id').aiterator():
+        images[image.product_id].append(image)
+    return images
+
+
+def filter_products(request, queryset):
+    search = request.GET.get('search', '').strip()
+    for term in search.replace(',', ' ').split():
+        condition = Q()
+        for field in PRODUCT_SEARCH_FIELDS:
+            condition |= Q(**{f'{field}__icontains': term})
+        queryset = queryset.filter(condition)
+
+    ordering = [
+        field for field in request.GET.get('ordering', '').split(',')
+        if field.lstrip('-') in PRODUCT_ORDERING_FIELDS
+    ]
+    if ordering:
+        queryset = queryset.order_by(*ordering)
+    return queryset
+
+
+def page_link(request, page_number):
+    query = request.GET.copy()
+    if page_number == 1:
+        query.pop(DefaultPagination.page_query_param, None)
+    else:
+        query[DefaultPagination.page_query_param] = page_number
+    url = request.build_absolute_uri(request.path)
+    return f'{url}?{query.urlencode()}' if query else url
+
+
+async def filterset_queryset(request):
+    """
+    ProductFilter applied to the query string, and its errors. Validating
+    collection_id with the filterset would query the collection synchronously,
+    so it is checked here with the async ORM instead.
+    """
+    query = request.GET.copy()
+    collection_id = query.pop('collection_id', [''])[-1].strip()
+    filterset = ProductFilter(query, queryset=Product.objects.all())
+    errors = {} if filterset.is_valid() else dict(filterset.errors)
+    if collection_id and not (collection_id.isdigit()
+                              and await Collection.objects.filter(pk=collection_id).aexists()):
+        errors['collection_id'] = ['Select a valid choice. That choice is not one of the available choices.']
+    if errors:
+        return None, errors
+    queryset = filterset.qs
+    return (queryset.filter(collection_id=collection_id) if collection_id else queryset), None
+
+
+@read_only
+async def product_list(request):
+    queryset, errors = await filterset_queryset(request)
+    if errors:
+        return render(errors, status=400)
+    queryset = filter_products(request, queryset)
+
+    try:
+        page_number = int(request.GET.get(DefaultPagination.page_query_param, 1))
+    except ValueError:
+        page_number = 0
+    page_size = DefaultPagination.page_size
+    count = await queryset.acount()
+    if page_number < 1 or (page_number > 1 and (page_number - 1) * page_size >= count):
+        return render({'detail': 'Invalid page.'}, status=404)
+
+    offset = (page_number - 1) * page_size
+    products = [product async for product in queryset[offset:offset + page_size].aiterator()]
+    images = await images_by_product([product.id for product in products])
+
+    return render({
+        'count': count,
+        'next': page_link(request, page_number + 1) if offset + page_size < count else None,
+        'previous': page_link(request, page_number - 1) if page_number > 1 else None,
+        'results': [serialize_product(product, images[product.id], request) for product in products],
+    })
+
+
+@read_only
+async def product_detail(request, pk):
+    try:
+        product = await Product.objects.aget(pk=pk)
+    except Product.DoesNotExist:
+        return not_found()
+    images = await images_by_product([product.id])
+    return render(serialize_product(product, images[product.id], request))
+
+
+@read_only
+async def product_image_list(request, product_pk):
+    images = ProductImage.objects.filter(product_id=product_pk).order_by('id')
+    return render([serialize_image(image) async for image in images.aiterator()])
+
+
+@read_only
+async def product_image_detail(request, product_pk, pk):
+    try:
+        image = await ProductImage.objects.aget(product_id=product_pk, pk=pk)
+    except ProductImage.DoesNotExist:
+        return not_found()
+    return render(serialize_image(image))
+
+
+def collections():
+    return Collection.objects.annotate(products_count=Count('products'))
+
+
+def serialize_collection(collection: Collection):
+    return {'id': collection.id, 'title': collection.title, 'products_count': collection.products_count}
+
+
+@read_only
+async def collection_list(request):
+    return render([serialize_collection(collection) async for collection in collections().aiterator()])
+
+
+@read_only
+async def collection_detail(request, pk):
+    try:
+        collection = await collections().aget(pk=pk)
+    except Collection.DoesNotExist:
+        return not_found()
+    return render(serialize_collection(collection))
+
+
+# Payment status changes of the customer's orders as server-sent events. An
+# idle stream costs a coroutine and a subscription to the in-process hub,
+# with a keep-alive comment every HEARTBEAT_INTERVAL seconds. Streams close
+# after ORDER_EVENTS_MAX_AGE seconds and EventSource reconnects by itself,
+# and every ORDER_EVENTS_RESYNC_INTERVAL seconds the watched orders are read
+# back from the database, to catch changes made by other processes.
+
+HEARTBEAT_INTERVAL = 15
+RETRY_MILLISECONDS = 3000
+
+
+def stream_customer_id(request):
+    """
+    The customer of the JWT in the Authorization header or, since EventSource
+    cannot send headers, in the `token` query parameter.
+    """
+    authentication = CachedJWTAuthentication()
+    try:
+        token = request.GET.get('token')
+        if token:
+            user = authentication.get_user(authentication.get_validated_token(token))
+        else:
+            result = authentication.authenticate(request)
+            if result is None:
+                return None
+            user = result[0]
+        return get_customer_id(user)
+    except (AuthenticationFailed, InvalidToken, Customer.DoesNotExist):
+        return None
+
+
+async def order_statuses(customer_id, order_ids):
+    """{order id: payment status} of the customer's pending orders and of `order_ids`."""
+    orders = Order.objects \
+        .filter(Q(payment_status=Order.PAYMENT_STATUS_PENDING) | Q(id__in=order_ids), customer_id=customer_id) \
+        .values_list('id', 'payment_status')
+    return {order_id: payment_status async for order_id, payment_status in orders}
+
+
+async def order_event_stream(subscriber, watched):
+    loop = asyncio.get_running_loop()
+    max_age = getattr(settings, 'ORDER_EVENTS_MAX_AGE', 600)
+    resync_interval = getattr(settings, 'ORDER_EVENTS_RESYNC_INTERVAL', 30)
+    deadline = loop.time() + max_age
+    next_resync = loop.time() + resync_interval if resync_interval else deadline
+    try:
+        yield f'retry: {RETRY_MILLISECONDS}\n\n'
+        for order_id, payment_status in watched.items():
+            yield events.format_event('payment_status', events.status_event(order_id, payment_status))
+
+        while loop.time() < deadline:
+            now = loop.time()
+            changes, overflowed = await subscriber.get(max(min(HEARTBEAT_INTERVAL, next_resync - now, deadline - now), 0))
+            if overflowed:
+                yield events.format_event('resync', {})
+            if resync_interval and loop.time() >= next_resync:
+                statuses = await order_statuses(subscriber.customer_id, list(watched))
+                changes += [events.status_event(order_id, payment_status)
+                            for order_id, payment_status in statuses.items()]
+                next_resync = loop.time() + resync_interval
+
+            sent = overflowed
+            for event in changes:
+                if watched.get(event['order_id']) != event['payment_status']:
+                    watched[event['order_id']] = event['payment_status']
+                    yield events.format_event('payment_status', event)
+                    sent = True
+            if not sent:
+                yield ': keep-alive\n\n'
+    finally:
+        events.hub.unsubscribe(subscriber)
+
+
+@read_only
+async def order_events(request):
+    if not isinstance(request, ASGIRequest):
+        return render({'detail': 'Order events are only served under ASGI.'}, status=501)
+    customer_id = await sync_to_async(stream_customer_id)(request)
+    if customer_id is None:
+        return render({'detail': 'Authentication credentials were not provided or are invalid.'}, status=401)
+    try:
+        order_ids = [int(order_id) for order_id in request.GET.get('orders', '').split(',') if order_id]
+    except ValueError:
+        return render({'orders': 'Expected a comma separated list of order ids.'}, status=400)
+
+    # Subscribe before reading the current statuses, so no change falls in between.
+    subscriber = events.hub.subscribe(customer_id)
+    try:
+        watched = await order_statuses(customer_id, order_ids)
+    except BaseException:
+        events.hub.unsubscribe(subscriber)
+        raise
+    response = StreamingHttpResponse(order_event_stream(subscriber, watched), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
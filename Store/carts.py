@@ -0,0 +1,207 @@
+import threading
+from uuid import UUID, uuid4
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.redis import RedisCache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .models import Cart, CartItem, Product
+
+# Optional storage of carts in the cache (CART_STORAGE = 'cache'). Carts are
+# written to the database only at checkout and by flush_carts(), so browsing
+# does not write to the database at all. Items of cached carts use the id of
+# their product as their own id.
+#
+# The ids of the carts changed since the last flush are kept in a Redis set
+# (SADD on every write, SPOP by the flush), so marking is O(1) and no mark is
+# lost to concurrent writers. Several processes must share the carts, so the
+# 'carts' cache has to be Redis; the local memory cache, with an in-process
+# set, is only accepted with DEBUG (see Store/checks.py).
+
+DIRTY_KEY = 'carts:dirty'
+FLUSH_BATCH_SIZE = 500
+
+_dirty = set()
+_dirty_lock = threading.Lock()
+
+
+def cache_enabled():
+    return getattr(settings, 'CART_STORAGE', 'database') == 'cache'
+
+
+def cart_cache():
+    return caches['carts']
+
+
+def cart_key(cart_id):
+    return f'cart:{cart_id}'
+
+
+def redis_client():
+    """The Redis client of the 'carts' cache and the full dirty set key, or (None, None)."""
+    cache = cart_cache()
+    if not isinstance(cache, RedisCache):
+        return None, None
+    key = cache.make_and_validate_key(DIRTY_KEY)
+    return cache._cache.get_client(key, write=True), key
+
+
+def mark_dirty(cart_ids):
+    cart_ids = [str(cart_id) for cart_id in cart_ids]
+    if not cart_ids:
+        return
+    client, key = redis_client()
+    if client is not None:
+        client.sadd(key, *cart_ids)
+    else:
+        with _dirty_lock:
+            _dirty.update(cart_ids)
+
+
+def pop_dirty(count):
+    """Remove and return up to `count` ids of changed carts."""
+    client, key = redis_client()
+    if client is not None:
+        return [cart_id.decode() for cart_id in client.spop(key, count) or []]
+    with _dirty_lock:
+        return [_dirty.pop() for _ in range(min(count, len(_dirty)))]
+
+
+class CartItemList(list):
+    def all(self):
+        return self
+
+
+class CachedCart:
+    def __init__(self, id, quantities=None, created_at=None):
+        self.id = id
+        self.quantities = quantities or {}
+        self.created_at = created_at or timezone.now()
+        self._items = None
+
+    @property
+    def items(self):
+        """The items of the cart as unsaved CartItem instances, with their products."""
+        if self._items is None:
+            products = Product.objects.in_bulk(list(self.quantities))
+            self._items = CartItemList(
+                CartItem(id=product_id, cart_id=self.id, product=products[product_id], quantity=quantity)
+                for product_id, quantity in self.quantities.items()
+                if product_id in products
+            )
+        return self._items
+
+    def get_item(self, product_id):
+        for item in self.items:
+            if item.id == product_id:
+                return item
+        return None
+
+    def set_quantity(self, product_id, quantity):
+        if quantity:
+            self.quantities[product_id] = quantity
+        else:
+            self.quantities.pop(product_id, None)
+        self._items = None
+
+    def add_quantities(self, quantities):
+        for product_id, quantity in quantities.items():
+            self.set_quantity(product_id, self.quantities.get(product_id, 0) + quantity)
+
+
+def parse_cart_id(cart_id):
+    try:
+        return UUID(str(cart_id))
+    except ValueError:
+        return None
+
+
+def create_cart():
+    # An empty cart is not worth flushing, so it is not marked dirty.
+    cart = CachedCart(uuid4())
+    cart_cache().set(cart_key(cart.id), serialize_cart(cart))
+    return cart
+
+
+def get_cart(cart_id):
+    """
+    Return the cart from the cache, loading it from the database on a miss, or
+    None when it does not exist.
+    """
+    cart_id = parse_cart_id(cart_id)
+    if cart_id is None:
+        return None
+
+    data = cart_cache().get(cart_key(cart_id))
+    if data is not None:
+        return CachedCart(cart_id, {int(product_id): quantity for product_id, quantity in data['items'].items()},
+                          parse_datetime(data['created_at']))
+
+    cart = Cart.objects.filter(pk=cart_id).first()
+    if cart is None:
+        return None
+    cached_cart = CachedCart(cart_id, dict(cart.items.values_list('product_id', 'quantity')), cart.created_at)
+    cart_cache().set(cart_key(cart_id), serialize_cart(cached_cart))
+    return cached_cart
+
+
+def serialize_cart(cart: CachedCart):
+    return {'created_at': cart.created_at.isoformat(), 'items': cart.quantities}
+
+
+def save_cart(cart: CachedCart):
+    cart_cache().set(cart_key(cart.id), serialize_cart(cart))
+    mark_dirty([cart.id])
+
+
+def delete_cart(cart_id):
+    cart_cache().delete(cart_key(cart_id))
+    Cart.objects.filter(pk=cart_id).delete()
+
+
+def discard_cart(cart_id):
+    cart_cache().delete(cart_key(cart_id))
+
+
+def materialize_cart(cart_id):
+    """
+    Write the cached cart into Cart and CartItem rows. Returns False when the
+    cart is not in the cache.
+    """
+    cart_id = parse_cart_id(cart_id)
+    data = cart_cache().get(cart_key(cart_id)) if cart_id else None
+    if data is None:
+        return False
+
+    quantities = {int(product_id): quantity for product_id, quantity in data['items'].items()}
+    with transaction.atomic():
+        Cart.objects.update_or_create(pk=cart_id, defaults={'last_activity': timezone.now()})
+        CartItem.objects.filter(cart_id=cart_id).exclude(product_id__in=quantities).delete()
+        product_ids = Product.objects.filter(pk__in=quantities).values_list('id', flat=True)
+        CartItem.objects.bulk_create(
+            [CartItem(cart_id=cart_id, product_id=product_id, quantity=quantities[product_id])
+             for product_id in product_ids],
+            update_conflicts=True,
+            unique_fields=['cart', 'product'],
+            update_fields=['quantity'],
+        )
+    return True
+
+
+def flush_carts():
+    """
+    Write every cart changed since the last flush to the database. A cart is
+    unmarked before it is read, so a change made meanwhile marks it again.
+    """
+    flushed = 0
+    while True:
+        cart_ids = pop_dirty(FLUSH_BATCH_SIZE)
+        for position, cart_id in enumerate(cart_ids):
+            try:
+                flushed += materialize_cart(cart_id)
+            except Exception:
+                mark_dirty(cart_ids[position:])
+                raise
+        if len(cart_ids) < FLUSH_BATCH_SIZE:
+            return flushed
@@ -0,0 +1,95 @@
+from decimal import Decimal, InvalidOperation
+from django.db import transaction
+from django.utils import timezone
+from .models import Product
+from .signals import products_changed
+
+# Bulk price and inventory changes for staff. Rows are checked with plain
+# comparisons rather than one serializer per row, and written with
+# bulk_update(), a batch at a time, inside a single transaction.
+
+MAX_ROWS = 10000
+BATCH_SIZE = 500
+MAX_PRICE = Decimal('9999999.99')
+
+
+def parse_change(row):
+    """Return (product id, {field: value}, errors) for one requested change."""
+    errors = {}
+    values = {}
+    product_id = row.get('id')
+    if isinstance(product_id, bool) or not isinstance(product_id, int):
+        errors['id'] = 'A valid integer is required.'
+
+    if 'unit_price' in row:
+        try:
+            price = Decimal(str(row['unit_price']))
+        except InvalidOperation:
+            errors['unit_price'] = 'A valid number is required.'
+        else:
+            if not price.is_finite() or price.as_tuple().exponent < -2:
+                errors['unit_price'] = 'Ensure that there are no more than 2 decimal places.'
+            elif not Decimal(1) <= price <= MAX_PRICE:
+                errors['unit_price'] = f'Ensure this value is between 1 and {MAX_PRICE}.'
+            else:
+                values['unit_price'] = price
+
+    if 'inventory' in row:
+        inventory = row['inventory']
+        if isinstance(inventory, bool) or not isinstance(inventory, int):
+            errors['inventory'] = 'A valid integer is required.'
+        elif inventory < 0:
+            errors['inventory'] = 'Ensure this value is greater than or equal to 0.'
+        else:
+            values['inventory'] = inventory
+
+    if not errors and not values:
+        errors['non_field_errors'] = 'Provide unit_price, inventory or both.'
+    return product_id, values, errors
+
+
+def update_products(rows, batch_size=BATCH_SIZE):
+    """
+    Apply price and inventory changes and return one result per row, with the
+    status 'updated', 'unchanged', 'not_found' or 'invalid'. Invalid rows are
+    skipped, the others are applied together or not at all.
+    """
+    results = [None] * len(rows)
+    changes = {}
+    for position, row in enumerate(rows):
+        product_id, values, errors = parse_change(row)
+        if not errors and product_id in changes:
+            errors = {'id': 'Duplicate product in the request.'}
+        if errors:
+            results[position] = {'id': product_id, 'status': 'invalid', 'errors': errors}
+        else:
+            changes[product_id] = (position, values)
+
+    product_ids = list(changes)
+    now = timezone.now()
+    with transaction.atomic():
+        for start in range(0, len(product_ids), batch_size):
+            batch = product_ids[start:start + batch_size]
+            products = Product.objects \
+                .only('id', 'unit_price', 'inventory', 'last_update') \
+                .select_for_update() \
+                .in_bulk(batch)
+            changed = []
+            for product_id in batch:
+                position, values = changes[product_id]
+                product = products.get(product_id)
+                if product is None:
+                    results[position] = {'id': product_id, 'status': 'not_found'}
+                    continue
+                if all(getattr(product, name) == value for name, value in values.items()):
+                    results[position] = {'id': product_id, 'status': 'unchanged'}
+                    continue
+                for name, value in values.items():
+                    setattr(product, name, value)
+                product.last_update = now
+                changed.append(product)
+                results[position] = {'id': product_id, 'status': 'updated'}
+            if changed:
+                Product.objects.bulk_update(changed, ['unit_price', 'inventory', 'last_update'])
+                products_changed.send(sender=Product, product_ids=[product.id for product in changed])
+    return results
@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.core.cache.backends.redis import RedisCache
+from FurnitureStore.caches import is_shared
+
+
+@checks.register(checks.Tags.caches)
+def check_cart_cache(app_configs, **kwargs):
+    if getattr(settings, 'CART_STORAGE', 'database') != 'cache' or isinstance(caches['carts'], RedisCache):
+        return []
+    message = "CART_STORAGE = 'cache' needs a Redis 'carts' cache (CART_CACHE_BACKEND)."
+    hint = ('Carts and the set of carts to flush must be shared by every process and not be evicted. '
+            'The local memory cache is only accepted with DEBUG, for a single development server.')
+    if settings.DEBUG:
+        return [checks.Warning(message, hint=hint, id='Store.W001')]
+    return [checks.Error(message, hint=hint, id='Store.E001')]
+
+
+@checks.register(checks.Tags.caches)
+def check_idempotency_cache(app_configs, **kwargs):
+    if settings.DEBUG or is_shared():
+        return []
+    return [checks.Warning(
+        'Idempotency-Key requests are only deduplicated within one process.',
+        hint='The keys are kept in the default cache, which is local to each worker. '
+             'Use a shared backend (Redis, Memcached, database or file based) for it.',
+        id='Store.W002',
+    )]
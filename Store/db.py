@@ -0,0 +1,46 @@
+from django.db import NotSupportedError, connections, router, transaction
+
+
+def bulk_upsert_add(model, rows, conflict_fields, add_fields):
+    """
+    Insert `rows` (dicts of field name to value) into the table of `model`.
+
+    Rows that clash with an existing one on `conflict_fields` add their values
+    of `add_fields` to the stored values instead, in the same statement, so
+    concurrent writers never lose an update.
+    """
+    if not rows:
+        return
+
+    connection = connections[router.db_for_write(model)]
+    quote_name = connection.ops.quote_name
+    table = quote_name(model._meta.db_table)
+    names = list(rows[0])
+    fields = [model._meta.get_field(name) for name in names]
+    columns = ', '.join(quote_name(field.column) for field in fields)
+    conflict_columns = ', '.join(quote_name(model._meta.get_field(name).column) for name in conflict_fields)
+    add_columns = [quote_name(model._meta.get_field(name).column) for name in add_fields]
+
+    if connection.vendor in ('sqlite', 'postgresql'):
+        suffix = 'ON CONFLICT ({}) DO UPDATE SET {}'.format(
+            conflict_columns,
+            ', '.join(f'{column} = {table}.{column} + excluded.{column}' for column in add_columns))
+    elif connection.vendor == 'mysql':
+        suffix = 'ON DUPLICATE KEY UPDATE {}'.format(
+            ', '.join(f'{column} = {column} + VALUES({column})' for column in add_columns))
+    else:
+        raise NotSupportedError(f'bulk_upsert_add() is not supported on {connection.vendor}.')
+
+    row_placeholder = '({})'.format(', '.join(['%s'] * len(fields)))
+    batch_size = max(1, (connection.features.max_query_params or 2000) // len(fields))
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            params = [
+                field.get_db_prep_save(row[name], connection)
+                for row in batch
+                for name, field in zip(names, fields)
+            ]
+            cursor.execute(
+                f'INSERT INTO {table} ({columns}) VALUES {", ".join([row_placeholder] * len(batch))} {suffix}',
+                params)
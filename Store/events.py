@@ -0,0 +1,108 @@
+import asyncio
+import json
+import threading
+from collections import defaultdict
+from django.utils import timezone
+from .models import Order
+
+# In-process publish/subscribe of order payment status changes, feeding the
+# server-sent events stream. Publishers run in any thread and never block:
+# events are handed to the subscriber's event loop with call_soon_threadsafe()
+# and held until the stream sends them, one per order, a newer status
+# replacing an unsent older one. A subscriber that falls more than
+# MAX_PENDING orders behind is told to resync instead of buffering without
+# bound. Subscribers only see events published in their own process.
+
+MAX_PENDING = 100
+
+STATUS_LABELS = dict(Order.PAYMENT_STATUS_CHOICES)
+
+
+def status_event(order_id, payment_status):
+    return {
+        'order_id': order_id,
+        'payment_status': payment_status,
+        'payment_status_display': STATUS_LABELS.get(payment_status, payment_status),
+        'changed_at': timezone.now().isoformat(),
+    }
+
+
+class Subscriber:
+    def __init__(self, customer_id, loop, max_pending=MAX_PENDING):
+        self.customer_id = customer_id
+        self.loop = loop
+        self.max_pending = max_pending
+        self.pending = {}
+        self.overflowed = False
+        self.ready = asyncio.Event()
+
+    def deliver(self, event):
+        # Runs in the subscriber's event loop.
+        order_id = event['order_id']
+        if order_id not in self.pending and len(self.pending) >= self.max_pending:
+            self.pending.clear()
+            self.overflowed = True
+        else:
+            self.pending.pop(order_id, None)
+            self.pending[order_id] = event
+        self.ready.set()
+
+    async def get(self, timeout):
+        """Wait up to `timeout` seconds. Returns the pending events and whether some were dropped."""
+        try:
+            await asyncio.wait_for(self.ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return [], False
+        self.ready.clear()
+        events, overflowed = list(self.pending.values()), self.overflowed
+        self.pending = {}
+        self.overflowed = False
+        return events, overflowed
+
+
+class OrderEventHub:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers = defaultdict(set)
+
+    def subscribe(self, customer_id):
+        """Subscribe the running event loop to the events of a customer's orders."""
+        subscriber = Subscriber(customer_id, asyncio.get_running_loop())
+        with self.lock:
+            self.subscribers[customer_id].add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            subscribers = self.subscribers.get(subscriber.customer_id)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self.subscribers[subscriber.customer_id]
+
+    def publish(self, customer_id, event):
+        """Hand `event` to the subscribers of the customer. Returns their number."""
+        with self.lock:
+            subscribers = list(self.subscribers.get(customer_id, ()))
+        for subscriber in subscribers:
+            try:
+                subscriber.loop.call_soon_threadsafe(subscriber.deliver, event)
+            except RuntimeError:
+                # The subscriber's loop is closed; its stream is gone.
+                self.unsubscribe(subscriber)
+        return len(subscribers)
+
+    def connections(self):
+        with self.lock:
+            return sum(len(subscribers) for subscribers in self.subscribers.values())
+
+
+hub = OrderEventHub()
+
+
+def publish_status(customer_id, order_id, payment_status):
+    return hub.publish(customer_id, status_event(order_id, payment_status))
+
+
+def format_event(name, data):
+    return f'event: {name}\ndata: {json.dumps(data)}\n\n'
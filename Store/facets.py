@@ -0,0 +1,97 @@
+import hashlib
+from decimal import Decimal, InvalidOperation
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import BooleanField, Case, Count, IntegerField, Q, Value, When
+from rest_framework.exceptions import ValidationError
+
+# Facet counts for the product list: per collection, per price bucket and in
+# stock versus out of stock, all from one GROUP BY over the filtered products.
+# Results are cached per filter signature and catalog version, and the version
+# is bumped whenever products or collections change.
+
+VERSION_KEY = 'catalog:version'
+# Query parameters that do not change which products match.
+IGNORED_PARAMS = {'page', 'page_size', 'ordering', 'facets', 'price_buckets', 'fields', 'exclude'}
+
+
+def catalog_version():
+    return cache.get_or_set(VERSION_KEY, 0, None)
+
+
+def bump_catalog_version():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, 1, None)
+
+
+def parse_buckets(value):
+    """'100,250,500' -> [Decimal('100'), Decimal('250'), Decimal('500')]"""
+    if not value:
+        return [Decimal(bound) for bound in getattr(settings, 'PRODUCT_PRICE_BUCKETS', [100, 250, 500, 1000])]
+    try:
+        bounds = sorted({Decimal(bound) for bound in value.split(',')})
+    except InvalidOperation:
+        raise ValidationError({'price_buckets': 'Expected a comma separated list of prices.'})
+    if not bounds or len(bounds) > 20:
+        raise ValidationError({'price_buckets': 'Expected between 1 and 20 prices.'})
+    return bounds
+
+
+def bucket_label(bounds, index):
+    if index == 0:
+        return f'<{bounds[0]}'
+    if index == len(bounds):
+        return f'{bounds[-1]}+'
+    return f'{bounds[index - 1]}-{bounds[index]}'
+
+
+def cache_key(params, bounds):
+    signature = sorted(
+        (name, value)
+        for name in params if name not in IGNORED_PARAMS
+        for value in params.getlist(name)
+    )
+    digest = hashlib.md5(repr((signature, bounds)).encode(), usedforsecurity=False).hexdigest()
+    return f'facets:{catalog_version()}:{digest}'
+
+
+def compute_facets(queryset, bounds):
+    bucket = Case(
+        *[When(unit_price__lt=bound, then=Value(index)) for index, bound in enumerate(bounds)],
+        default=Value(len(bounds)),
+        output_field=IntegerField(),
+    )
+    in_stock = Case(When(Q(inventory__gt=0), then=Value(True)), default=Value(False), output_field=BooleanField())
+    rows = queryset \
+        .order_by() \
+        .values('collection_id', 'collection__title', price_bucket=bucket, in_stock=in_stock) \
+        .annotate(count=Count('id'))
+
+    collections = {}
+    prices = [0] * (len(bounds) + 1)
+    stock = {'in_stock': 0, 'out_of_stock': 0}
+    for row in rows:
+        collection = collections.setdefault(
+            row['collection_id'], {'id': row['collection_id'], 'title': row['collection__title'], 'count': 0})
+        collection['count'] += row['count']
+        prices[row['price_bucket']] += row['count']
+        stock['in_stock' if row['in_stock'] else 'out_of_stock'] += row['count']
+
+    return {
+        'collections': sorted(collections.values(), key=lambda collection: collection['title']),
+        'price': [{'range': bucket_label(bounds, index), 'count': count} for index, count in enumerate(prices)],
+        'stock': stock,
+    }
+
+
+def get_facets(queryset, params):
+    """Facet counts of the products in `queryset`, which has the request's filters applied."""
+    bounds = parse_buckets(params.get('price_buckets'))
+    key = cache_key(params, bounds)
+    facets = cache.get(key)
+    if facets is None:
+        facets = compute_facets(queryset, bounds)
+        cache.set(key, facets, getattr(settings, 'FACETS_CACHE_TIMEOUT', 300))
+    return facets
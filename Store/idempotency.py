@@ -0,0 +1,130 @@
+import hashlib
+from functools import wraps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied
+from django.http import Http404
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.response import Response
+
+# Idempotency-Key support for POST endpoints. The first request with a key
+# runs and its response is stored for IDEMPOTENCY_KEY_TTL seconds; retries
+# with the same key get the stored response back without running the view,
+# and retries arriving while the first one is still running get 409 at once
+# rather than holding a worker. Client errors raised by the view (validation
+# errors, not found, ...) are stored like any other response; server errors
+# and throttling release the key so that a retry runs again. Keys live in the
+# default cache, so duplicates are only collapsed across workers when it is
+# shared (FurnitureStore.caches.is_shared); check Store.W002 warns otherwise.
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+IN_PROGRESS = 'in-progress'
+STORED_HEADERS = ('Location', 'WWW-Authenticate')
+
+
+def key_ttl():
+    return getattr(settings, 'IDEMPOTENCY_KEY_TTL', 24 * 60 * 60)
+
+
+def lock_timeout():
+    return getattr(settings, 'IDEMPOTENCY_LOCK_TIMEOUT', 300)
+
+
+def cache_key(request, key):
+    user = request.user.pk if request.user.is_authenticated else 'anonymous'
+    digest = hashlib.sha256(f'{user}:{request.path}:{key}'.encode()).hexdigest()
+    return f'idempotency:{digest}'
+
+
+def describe(value):
+    if hasattr(value, 'size'):
+        return f'file:{value.name}:{value.size}'
+    return value
+
+
+def fingerprint(request):
+    # Multipart bodies are streamed to disk by the upload handlers, so they
+    # are fingerprinted from the parsed form, which the view then reuses.
+    if request.content_type.startswith(('multipart/', 'application/x-www-form-urlencoded')):
+        form = sorted((name, [describe(value) for value in values]) for name, values in request.data.lists())
+        return hashlib.sha256(repr(form).encode()).hexdigest()
+    return hashlib.sha256(request._request.body).hexdigest()
+
+
+def replay(stored):
+    response = Response(stored['data'], status=stored['status'])
+    for name, value in stored['headers'].items():
+        response[name] = value
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def error(message, status_code, retry_after=None):
+    response = Response({'error': message}, status=status_code)
+    if retry_after is not None:
+        response['Retry-After'] = str(retry_after)
+    return response
+
+
+def in_progress():
+    return error('A request with this Idempotency-Key is still being processed.',
+                 status.HTTP_409_CONFLICT, retry_after=1)
+
+
+def idempotent(view):
+    """Decorate a view method so that requests with an Idempotency-Key header run once."""
+
+    @wraps(view)
+    def wrapper(self, request, *args, **kwargs):
+        idempotency_key = request.headers.get(HEADER)
+        if not idempotency_key:
+            return view(self, request, *args, **kwargs)
+        if len(idempotency_key) > MAX_KEY_LENGTH:
+            return error(f'{HEADER} must be at most {MAX_KEY_LENGTH} characters long.', status.HTTP_400_BAD_REQUEST)
+
+        key = cache_key(request, idempotency_key)
+        request_fingerprint = fingerprint(request)
+        if not cache.add(key, IN_PROGRESS, lock_timeout()):
+            stored = cache.get(key)
+            if stored == IN_PROGRESS:
+                return in_progress()
+            if stored is not None:
+                if stored['fingerprint'] != request_fingerprint:
+                    return error(f'This {HEADER} was already used with a different request.',
+                                 status.HTTP_422_UNPROCESSABLE_ENTITY)
+                return replay(stored)
+            # The first request failed and released the key: run this one,
+            # unless another retry took the key first.
+            if not cache.add(key, IN_PROGRESS, lock_timeout()):
+                return in_progress()
+
+        try:
+            response = view(self, request, *args, **kwargs)
+        except (APIException, Http404, PermissionDenied) as exc:
+            response = self.handle_exception(exc)
+        except BaseException:
+            cache.delete(key)
+            raise
+
+        if response.status_code >= 500 or response.status_code == status.HTTP_429_TOO_MANY_REQUESTS:
+            cache.delete(key)
+            return response
+        cache.set(key, {
+            'fingerprint': request_fingerprint,
+            'status': response.status_code,
+            'data': response.data,
+            'headers': {name: response[name] for name in STORED_HEADERS if response.has_header(name)},
+        }, key_ttl())
+        return response
+
+    return wrapper
+
+
+class IdempotentCreateMixin:
+    """Honours Idempotency-Key on the create action of a viewset."""
+
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
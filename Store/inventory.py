@@ -0,0 +1,78 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.mail import send_mail
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .models import LowStockProduct, Product
+
+CHUNK_SIZE = 500
+
+
+def default_threshold():
+    return getattr(settings, 'LOW_STOCK_THRESHOLD', 10)
+
+
+def with_threshold(queryset):
+    return queryset.annotate(threshold=Coalesce(
+        'low_stock_threshold', 'collection__low_stock_threshold', Value(default_threshold())))
+
+
+def refresh_low_stock(product_ids=None):
+    """
+    Bring LowStockProduct up to date for the given products, or for all of them.
+    Products already listed keep their `since` and `notified_at`, so they are
+    only reported again after they recover and drop below the threshold anew.
+    """
+    if product_ids is None:
+        product_ids = Product.objects.values_list('id', flat=True).iterator(chunk_size=CHUNK_SIZE)
+    product_ids = list(product_ids)
+    for start in range(0, len(product_ids), CHUNK_SIZE):
+        refresh_chunk(product_ids[start:start + CHUNK_SIZE])
+
+
+def refresh_chunk(product_ids):
+    rows = with_threshold(Product.objects.filter(pk__in=product_ids)).values_list('id', 'inventory', 'threshold')
+    low = {product_id: (inventory, threshold) for product_id, inventory, threshold in rows if inventory < threshold}
+    with transaction.atomic():
+        LowStockProduct.objects.filter(product_id__in=product_ids).exclude(product_id__in=low).delete()
+        LowStockProduct.objects.bulk_create(
+            [LowStockProduct(product_id=product_id, inventory=inventory, threshold=threshold)
+             for product_id, (inventory, threshold) in low.items()],
+            update_conflicts=True,
+            unique_fields=['product'],
+            update_fields=['inventory', 'threshold'],
+        )
+
+
+def staff_emails():
+    return list(get_user_model().objects
+                .filter(is_staff=True, is_active=True)
+                .exclude(email='')
+                .values_list('email', flat=True))
+
+
+def send_low_stock_digest():
+    """
+    Email staff one message listing the products that went low on stock since
+    the last digest. Returns the number of products reported.
+    """
+    pending = list(LowStockProduct.objects
+                   .filter(notified_at__isnull=True)
+                   .select_related('product')
+                   .order_by('inventory'))
+    recipients = staff_emails()
+    if not pending or not recipients:
+        return 0
+
+    lines = [f'{item.product.title} (#{item.product_id}): {item.inventory} left, threshold {item.threshold}'
+             for item in pending]
+    send_mail(
+        subject=f'{len(pending)} products are low on stock',
+        message='\n'.join(lines),
+        from_email=None,
+        recipient_list=recipients,
+    )
+    LowStockProduct.objects.filter(pk__in=[item.pk for item in pending]).update(notified_at=timezone.now())
+    return len(pending)
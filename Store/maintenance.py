@@ -0,0 +1,104 @@
+import logging
+import threading
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from . import carts, inventory, uploads
+from .models import Cart, CartItem, WishList
+
+logger = logging.getLogger(__name__)
+
+_scheduler = None
+
+
+def delete_in_chunks(queryset, chunk_size):
+    """
+    Delete the rows of `queryset` `chunk_size` at a time, each chunk in its own
+    short transaction so the write lock is never held for long.
+    """
+    model = queryset.model
+    deleted = 0
+    while True:
+        ids = list(queryset.values_list('pk', flat=True)[:chunk_size])
+        if not ids:
+            return deleted
+        with transaction.atomic():
+            # Check the rows again, and lock them, inside the transaction: a
+            # cart used or a wishlist filled since they were selected stays.
+            chunk = queryset.filter(pk__in=ids)
+            ids = list(chunk.select_for_update(of=('self',)).values_list('pk', flat=True))
+            if model is Cart:
+                CartItem.objects.filter(cart_id__in=ids).delete()
+            deleted += chunk.filter(pk__in=ids).delete()[1].get(model._meta.label, 0)
+
+
+def purge_stale_carts(idle_ttl=None, chunk_size=500, dry_run=False):
+    """
+    Delete carts without activity for `idle_ttl` and empty wishlists older than
+    it. Returns the number of deleted (or, with `dry_run`, deletable) rows.
+    """
+    if idle_ttl is None:
+        idle_ttl = timedelta(days=settings.CART_IDLE_TTL_DAYS)
+    cutoff = timezone.now() - idle_ttl
+
+    carts = Cart.objects.filter(last_activity__lt=cutoff)
+    wishlists = WishList.objects.filter(created_at__lt=cutoff, items__isnull=True)
+
+    if dry_run:
+        return {'carts': carts.count(), 'wishlists': wishlists.count()}
+    return {
+        'carts': delete_in_chunks(carts, chunk_size),
+        'wishlists': delete_in_chunks(wishlists, chunk_size),
+    }
+
+
+def purge_job():
+    counts = purge_stale_carts()
+    logger.info('Purged %(carts)d carts and %(wishlists)d wishlists', counts)
+    logger.info('Purged %d stale uploads', uploads.purge_stale_uploads())
+
+
+def low_stock_digest_job():
+    logger.info('Reported %d low-stock products', inventory.send_low_stock_digest())
+
+
+def flush_job():
+    logger.info('Flushed %d cached carts', carts.flush_carts())
+
+
+def run_scheduler(interval, job):
+    while True:
+        time.sleep(interval)
+        try:
+            job()
+        except Exception:
+            logger.exception('Scheduled job %s failed', job.__name__)
+        finally:
+            close_old_connections()
+
+
+def start_scheduler():
+    """
+    Run the cart maintenance jobs in background threads of this process:
+    the purge every CART_PURGE_INTERVAL seconds and, with cached carts, the
+    flush every CART_FLUSH_INTERVAL seconds, and the low-stock digest every
+    LOW_STOCK_DIGEST_INTERVAL seconds. Enable the purge and the digest in a
+    single process only, or run their commands from cron instead.
+    """
+    global _scheduler
+    if _scheduler is not None:
+        return
+    _scheduler = []
+    jobs = [
+        (getattr(settings, 'CART_PURGE_INTERVAL', 0), purge_job),
+        (getattr(settings, 'LOW_STOCK_DIGEST_INTERVAL', 0), low_stock_digest_job),
+    ]
+    if carts.cache_enabled():
+        jobs.append((getattr(settings, 'CART_FLUSH_INTERVAL', 0), flush_job))
+    for interval, job in jobs:
+        if interval:
+            thread = threading.Thread(target=run_scheduler, args=(interval, job), name=job.__name__, daemon=True)
+            thread.start()
+            _scheduler.append(thread)
@@ -0,0 +1,24 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from Store.archive import archive_orders
+
+
+class Command(BaseCommand):
+    help = 'Move settled orders older than ORDER_ARCHIVE_AFTER_DAYS, with their items, to the archive tables.'
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.ORDER_ARCHIVE_AFTER_DAYS,
+                            help='Archive orders placed more than this many days ago.')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Number of orders moved per transaction.')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report how many orders would be archived without moving them.')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        archived = archive_orders(cutoff, batch_size=options['batch_size'], dry_run=options['dry_run'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{"Would archive" if options["dry_run"] else "Archived"} {archived} orders.'))
@@ -0,0 +1,67 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import URLError
+from urllib.request import urlopen
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare concurrent throughput of the catalog endpoints between a WSGI '
+        'server (sync viewsets) and an ASGI server (async views).'
+    )
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--wsgi-url', default='http://127.0.0.1:8000',
+                            help='Base URL of the WSGI server, e.g. gunicorn FurnitureStore.wsgi')
+        parser.add_argument('--asgi-url', default='http://127.0.0.1:8001',
+                            help='Base URL of the ASGI server, e.g. uvicorn FurnitureStore.asgi:application')
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--timeout', type=float, default=30)
+
+    def handle(self, *args, **options):
+        targets = [
+            ('wsgi', options['wsgi_url'], ['/store/products/', '/store/collections/']),
+            ('asgi', options['asgi_url'], ['/store/async/products/', '/store/async/collections/']),
+        ]
+        self.stdout.write(f"{'server':<6} {'path':<28} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'errors':>7}")
+        for name, base_url, paths in targets:
+            for path in paths:
+                result = self.run(base_url.rstrip('/') + path, options)
+                self.stdout.write(
+                    f"{name:<6} {path:<28} {result['throughput']:>9.1f} "
+                    f"{result['p50']:>9.1f} {result['p95']:>9.1f} {result['errors']:>7}")
+
+    def run(self, url, options):
+        timeout = options['timeout']
+
+        def fetch(_):
+            started = time.perf_counter()
+            try:
+                with urlopen(url, timeout=timeout) as response:
+                    response.read()
+                ok = True
+            except (URLError, OSError):
+                ok = False
+            return ok, (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            results = list(pool.map(fetch, range(options['requests'])))
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(latency for ok, latency in results if ok)
+        if len(latencies) >= 2:
+            p50 = statistics.median(latencies)
+            p95 = statistics.quantiles(latencies, n=20)[-1]
+        else:
+            p50 = p95 = latencies[0] if latencies else 0.0
+        return {
+            'throughput': len(latencies) / elapsed if elapsed else 0.0,
+            'p50': p50,
+            'p95': p95,
+            'errors': len(results) - len(latencies),
+        }
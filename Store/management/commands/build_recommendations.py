@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from Store import recommendations
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the "frequently bought together" tables from all orders.'
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=10000,
+                            help='Number of order lines fetched per database round trip.')
+        parser.add_argument('--max-pairs', type=int, default=200000,
+                            help='Pending product pairs kept in memory before they are written out.')
+        parser.add_argument('--top-k', type=int, default=recommendations.TOP_K,
+                            help='Number of related products kept per product.')
+
+    def handle(self, *args, **options):
+        orders = recommendations.rebuild(
+            chunk_size=options['chunk_size'],
+            max_pairs=options['max_pairs'],
+            top_k=options['top_k'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'Built recommendations from {orders} orders.'))
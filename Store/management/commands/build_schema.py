@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from FurnitureStore.schema import generate_schema, schema_file, write_schema
+
+
+class Command(BaseCommand):
+    help = 'Generate the OpenAPI schema served by the API docs into SCHEMA_FILE, with a gzipped copy.'
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default=None,
+                            help='Scheme, host and port of the API, e.g. https://api.example.com. '
+                                 'Without it the docs use the host they are served from.')
+        parser.add_argument('--output', default=None, help='Path to write instead of SCHEMA_FILE.')
+
+    def handle(self, *args, **options):
+        path = options['output'] or schema_file()
+        size, compressed_size = write_schema(generate_schema(url=options['url']), path)
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {path} ({size / 1024:.1f} KB, {compressed_size / 1024:.1f} KB gzipped).'))
@@ -0,0 +1,109 @@
+import os
+from django.core.files import File
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from Store.models import CustomOrder, Product, ProductImage
+from Store.storage import content_hash, hashed_name, is_hashed_name, media_storage
+
+MEDIA_FIELDS = [
+    (Product, 'cover_image'),
+    (ProductImage, 'image'),
+    (CustomOrder, 'left_side_image'),
+    (CustomOrder, 'right_side_image'),
+    (CustomOrder, 'front_image'),
+    (CustomOrder, 'rear_image'),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Move stored product and custom order images to content-addressed names, '
+        'rewrite the references and delete the duplicate files.'
+    )
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report what would change without touching files or rows.')
+        parser.add_argument('--prune', action='store_true',
+                            help='Also delete unreferenced files whose content is already stored under a hashed name.')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        renamed = {}
+        missing = set()
+
+        for model, field in MEDIA_FIELDS:
+            names = model.objects \
+                .exclude(**{f'{field}__isnull': True}) \
+                .exclude(**{field: ''}) \
+                .values_list(field, flat=True) \
+                .distinct()
+            for name in names.iterator():
+                if is_hashed_name(name) or name in missing:
+                    continue
+                if name not in renamed:
+                    new_name = self.store(name, dry_run)
+                    if new_name is None:
+                        missing.add(name)
+                        continue
+                    renamed[name] = new_name
+                if not dry_run:
+                    with transaction.atomic():
+                        model.objects.filter(**{field: name}).update(**{field: renamed[name]})
+
+        reclaimed = 0
+        deleted = 0
+        for old_name in renamed:
+            reclaimed += media_storage.size(old_name)
+            deleted += 1
+            if not dry_run:
+                media_storage.delete(old_name)
+
+        if options['prune']:
+            pruned, pruned_bytes = self.prune(dry_run)
+            deleted += pruned
+            reclaimed += pruned_bytes
+
+        for name in sorted(missing):
+            self.stderr.write(f'Missing file: {name}')
+        self.stdout.write(self.style.SUCCESS(
+            f'{"Would rewrite" if dry_run else "Rewrote"} {len(renamed)} files, '
+            f'{"would delete" if dry_run else "deleted"} {deleted} files '
+            f'({reclaimed / 2**20:.1f} MB reclaimed by removing duplicates).'))
+
+    def store(self, name, dry_run):
+        if not media_storage.exists(name):
+            return None
+        with media_storage.open(name) as content:
+            if dry_run:
+                return hashed_name(name, content_hash(content))
+            return media_storage.save(name, content)
+
+    def prune(self, dry_run):
+        referenced = set()
+        for model, field in MEDIA_FIELDS:
+            referenced.update(model.objects.values_list(field, flat=True).distinct())
+
+        root = media_storage.location
+        stored = {}
+        candidates = []
+        for directory, subdirectories, files in os.walk(root):
+            subdirectories[:] = [name for name in subdirectories if directory != root or name != 'uploads']
+            for filename in files:
+                name = os.path.relpath(os.path.join(directory, filename), root).replace(os.sep, '/')
+                if is_hashed_name(name):
+                    stored[os.path.splitext(os.path.basename(name))[0]] = name
+                elif name not in referenced:
+                    candidates.append(name)
+
+        pruned = pruned_bytes = 0
+        for name in candidates:
+            with open(media_storage.path(name), 'rb') as content:
+                digest = content_hash(File(content))
+            if digest in stored:
+                pruned += 1
+                pruned_bytes += media_storage.size(name)
+                if not dry_run:
+                    media_storage.delete(name)
+        return pruned, pruned_bytes
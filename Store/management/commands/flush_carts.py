@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from Store import carts
+
+
+class Command(BaseCommand):
+    help = 'Write the carts changed in the cache since the last flush to the database.'
+    requires_system_checks = []
+
+    def handle(self, *args, **options):
+        if not carts.cache_enabled():
+            self.stdout.write('Carts are stored in the database (CART_STORAGE is not "cache"); nothing to flush.')
+            return
+        self.stdout.write(self.style.SUCCESS(f'Flushed {carts.flush_carts()} carts.'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from Store import inventory
+
+
+class Command(BaseCommand):
+    help = 'Email staff the products that went low on stock since the last digest.'
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--refresh', action='store_true',
+                            help='Recompute the low-stock table from all products first.')
+
+    def handle(self, *args, **options):
+        if options['refresh']:
+            inventory.refresh_low_stock()
+        reported = inventory.send_low_stock_digest()
+        self.stdout.write(self.style.SUCCESS(f'Reported {reported} low-stock products.'))
@@ -0,0 +1,132 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter with -X importtime: boots Django the way a WSGI
+# worker does, serves one request and prints the timings of each phase.
+# importlib.import_module(), which loads the apps, models and URLconfs, is not
+# seen by -X importtime, so absolute imports are routed through __import__.
+WORKER = '''
+import importlib, json, sys, time
+from io import BytesIO
+import_module = importlib.import_module
+def timed_import_module(name, package=None):
+    if name.startswith('.'):
+        return import_module(name, package)
+    __import__(name)
+    return sys.modules[name]
+importlib.import_module = timed_import_module
+started = time.perf_counter()
+import django
+django.setup()
+setup = time.perf_counter()
+from django.core.handlers.wsgi import WSGIHandler
+application = WSGIHandler()
+loaded = time.perf_counter()
+path, _, query = sys.argv[1].partition('?')
+environ = {
+    'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query, 'SCRIPT_NAME': '',
+    'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'HTTP_HOST': 'localhost',
+    'SERVER_PROTOCOL': 'HTTP/1.1', 'wsgi.input': BytesIO(), 'wsgi.url_scheme': 'http', 'wsgi.errors': sys.stderr,
+}
+status = []
+response = application(environ, lambda code, headers, exc_info=None: status.append(code))
+b''.join(response)
+response.close()
+done = time.perf_counter()
+print(json.dumps({
+    'status': status[0], 'finished_at': time.time(),
+    'setup': setup - started, 'application': loaded - setup, 'first_response': done - loaded,
+}))
+'''
+
+
+def parse_importtime(stderr):
+    """{module: self time in seconds} from the output of -X importtime."""
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        own, _, module = line[len('import time:'):].split('|')
+        times[module.strip()] = times.get(module.strip(), 0) + int(own) / 1e6
+    return times
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure the time from process start to the first response of a worker, '
+        'with import time aggregated per app and per module.'
+    )
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/store/products/', help='Path of the first request.')
+        parser.add_argument('--runs', type=int, default=5, help='Worker starts to average over.')
+        parser.add_argument('--top', type=int, default=15, help='Number of slowest modules to list.')
+        parser.add_argument('--compare', action='store_true',
+                            help='Profile with LAZY_URLCONFS off and on, side by side.')
+
+    def handle(self, *args, **options):
+        if options['compare']:
+            modes = [('eager', {'LAZY_URLCONFS': 'False'}), ('lazy', {'LAZY_URLCONFS': 'True'})]
+        else:
+            modes = [('lazy' if settings.LAZY_URLCONFS else 'eager', {})]
+        results = [(name, self.profile(environ, options)) for name, environ in modes]
+
+        self.stdout.write(f"{'phase':<24}" + ''.join(f'{name + " ms":>12}' for name, _ in results))
+        for phase in ('total', 'interpreter', 'setup', 'application', 'first_response'):
+            self.stdout.write(f'{phase:<24}' + ''.join(f'{result[phase] * 1000:>12.1f}' for _, result in results))
+
+        for title, key in (('app', 'apps'), ('module', 'modules')):
+            names = sorted(
+                {name for _, result in results for name in result[key]},
+                key=lambda name: -max(result[key].get(name, 0) for _, result in results),
+            )[:options['top']]
+            self.stdout.write('')
+            self.stdout.write(f"{'imports by ' + title:<48}" + ''.join(f'{name + " ms":>12}' for name, _ in results))
+            for name in names:
+                self.stdout.write(f'{name:<48}' + ''.join(
+                    f'{result[key].get(name, 0) * 1000:>12.1f}' for _, result in results))
+
+    def profile(self, extra_environ, options):
+        environ = {**os.environ, **extra_environ, 'DJANGO_SETTINGS_MODULE': os.environ.get(
+            'DJANGO_SETTINGS_MODULE', 'FurnitureStore.settings')}
+        # The first start compiles bytecode and warms the OS cache; it is not counted.
+        runs = [self.start_worker(environ, options['path']) for _ in range(options['runs'] + 1)][1:]
+        phases = {
+            phase: statistics.median(run[phase] for run in runs)
+            for phase in ('total', 'interpreter', 'setup', 'application', 'first_response')
+        }
+        modules = defaultdict(float)
+        for run in runs:
+            for module, seconds in run['imports'].items():
+                modules[module] += seconds / len(runs)
+        app_names = sorted((config.name for config in apps.get_app_configs()), key=len, reverse=True)
+        by_app = defaultdict(float)
+        for module, seconds in modules.items():
+            app = next((name for name in app_names if module == name or module.startswith(name + '.')), None)
+            by_app[app or module.partition('.')[0]] += seconds
+        return {**phases, 'apps': by_app, 'modules': modules}
+
+    def start_worker(self, environ, path):
+        started_at = time.time()
+        process = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', WORKER, path],
+            cwd=settings.BASE_DIR, env=environ, capture_output=True, text=True,
+        )
+        if process.returncode:
+            raise CommandError(f'The worker failed:\n{process.stderr[-2000:]}')
+        result = json.loads(process.stdout.strip().splitlines()[-1])
+        if int(result['status'].split()[0]) >= 500:
+            raise CommandError(f"{path} answered {result['status']}.")
+        result['total'] = result['finished_at'] - started_at
+        result['interpreter'] = result['total'] - result['setup'] - result['application'] - result['first_response']
+        result['imports'] = parse_importtime(process.stderr)
+        return result
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+from Store import provisioning, records
+
+
+class Command(BaseCommand):
+    help = (
+        'Create users and their customers from a CSV file with a header line or a JSON Lines file. '
+        'Columns: username, email, first_name, last_name, phone_no, password, birth_date, gender.'
+    )
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Defaults to csv for .csv files, jsonl otherwise.')
+        parser.add_argument('--batch-size', type=int, default=provisioning.BATCH_SIZE)
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Processes hashing passwords, PROVISIONING_WORKERS by default.')
+        parser.add_argument('--no-email', action='store_true', help='Do not send the welcome emails.')
+        parser.add_argument('--dry-run', action='store_true', help='Only validate the file.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        format = options['format'] or records.file_format(path)
+        try:
+            with open(path, encoding='utf-8-sig', newline='') as file:
+                rows = list(records.read_rows(file, format))
+        except (OSError, UnicodeDecodeError) as error:
+            raise CommandError(f'Cannot read {path}: {error}')
+
+        if options['dry_run']:
+            accepted, errors = provisioning.validate_rows(rows)
+            self.report_errors(errors)
+            self.stdout.write(f'{len(accepted)} users would be created, {len(errors)} rows are invalid.')
+            return
+
+        user_ids, errors = provisioning.provision_users(
+            rows, batch_size=options['batch_size'], workers=options['workers'])
+        self.report_errors(errors)
+        self.stdout.write(self.style.SUCCESS(f'Created {len(user_ids)} users, skipped {len(errors)} invalid rows.'))
+        if user_ids and not options['no_email']:
+            self.stdout.write(f'Sent {provisioning.send_welcome_emails(user_ids)} welcome emails.')
+
+    def report_errors(self, errors, limit=20):
+        for error in errors[:limit]:
+            self.stderr.write(f"line {error['line']}: {error['errors']}")
+        if len(errors) > limit:
+            self.stderr.write(f'... and {len(errors) - limit} more invalid rows.')
@@ -0,0 +1,30 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from Store.maintenance import purge_stale_carts
+from Store.uploads import purge_stale_uploads
+
+
+class Command(BaseCommand):
+    help = 'Delete abandoned carts, empty wishlists and resumable uploads left unfinished.'
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ttl-days', type=int, default=settings.CART_IDLE_TTL_DAYS,
+                            help='Delete carts idle for longer than this many days.')
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help='Number of rows deleted per transaction.')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only count the rows that would be deleted.')
+
+    def handle(self, *args, **options):
+        counts = purge_stale_carts(
+            idle_ttl=timedelta(days=options['ttl_days']),
+            chunk_size=options['chunk_size'],
+            dry_run=options['dry_run'],
+        )
+        verb = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {counts['carts']} carts and {counts['wishlists']} empty wishlists."))
+        if not options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f'Deleted {purge_stale_uploads()} stale uploads.'))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from Store import analytics
+
+
+class Command(BaseCommand):
+    help = 'Recompute the daily sales rollups from all orders.'
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Number of rollup rows fetched and inserted per database round trip.')
+
+    def handle(self, *args, **options):
+        analytics.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS('Rebuilt the daily sales rollups.'))
@@ -0,0 +1,50 @@
+import csv
+import time
+from django.core.management.base import BaseCommand, CommandError
+from Store import reconciliation, records
+
+
+class Command(BaseCommand):
+    help = (
+        'Apply the payment statuses of a settlement file (CSV with a header line, or JSON Lines) '
+        'with the columns order_id, status and optionally amount.'
+    )
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Defaults to csv for .csv files, jsonl otherwise.')
+        parser.add_argument('--batch-size', type=int, default=reconciliation.BATCH_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would change.')
+        parser.add_argument('--report', help='Write every row that was not applied to this CSV file.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        started = time.perf_counter()
+        try:
+            with open(path, encoding='utf-8-sig', newline='') as file:
+                report = reconciliation.reconcile(
+                    records.read_rows(file, options['format'] or records.file_format(path)),
+                    batch_size=options['batch_size'],
+                    dry_run=options['dry_run'],
+                    max_reported=None if options['report'] else 20,
+                )
+        except (OSError, UnicodeDecodeError) as error:
+            raise CommandError(f'Cannot read {path}: {error}')
+
+        if options['report']:
+            with open(options['report'], 'w', newline='') as file:
+                writer = csv.DictWriter(file, fieldnames=['line', 'order_id', 'outcome', 'detail'])
+                writer.writeheader()
+                writer.writerows(report.problems)
+        else:
+            for problem in report.problems:
+                self.stderr.write(f"line {problem['line']}: order {problem['order_id']} {problem['outcome']}: "
+                                  f"{problem['detail']}")
+            if report.problem_count() > len(report.problems):
+                self.stderr.write(f'... and {report.problem_count() - len(report.problems)} more; see --report.')
+
+        summary = ', '.join(f'{count} {outcome}' for outcome, count in report.counts.items())
+        self.stdout.write(self.style.SUCCESS(
+            f"{'Would apply' if options['dry_run'] else 'Applied'}: {summary} "
+            f'({time.perf_counter() - started:.1f}s).'))
@@ -0,0 +1,101 @@
+import mimetypes
+import os
+import posixpath
+from urllib.parse import quote
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control
+from rest_framework.exceptions import NotAuthenticated, NotFound
+from rest_framework.negotiation import BaseContentNegotiation
+from rest_framework.permissions import AllowAny
+from rest_framework.views import APIView
+from core.authentication import get_customer_id
+from .models import Customer, CustomOrder, Product, ProductImage
+from .storage import HASHED_NAME_RE, media_storage
+
+SENDFILE_BACKEND = getattr(settings, 'MEDIA_SENDFILE_BACKEND', 'nginx')
+ACCEL_REDIRECT_PREFIX = getattr(settings, 'MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+ONE_YEAR = 365 * 24 * 60 * 60
+ONE_DAY = 24 * 60 * 60
+CUSTOM_ORDER_IMAGE_FIELDS = ['front_image', 'rear_image', 'left_side_image', 'right_side_image']
+
+
+class IgnoreClientContentNegotiation(BaseContentNegotiation):
+    def select_parser(self, request, parsers):
+        return parsers[0]
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return (renderers[0], renderers[0].media_type)
+
+
+class MediaView(APIView):
+    """
+    Serve files from MEDIA_ROOT in production.
+
+    The view only decides whether the file may be served and how it may be
+    cached; the bytes, including Range requests, are sent by the front proxy
+    through X-Accel-Redirect (nginx) or X-Sendfile (Apache, lighttpd).
+    Product images are public, custom order images are only served to the
+    customer who placed the order and to staff.
+    """
+    permission_classes = [AllowAny]
+    content_negotiation_class = IgnoreClientContentNegotiation
+
+    def get(self, request, path):
+        name = posixpath.normpath(path).lstrip('/')
+        if name.startswith(('..', 'uploads/')) or not media_storage.exists(name):
+            raise NotFound()
+
+        private = not self.is_public(name)
+        if private:
+            self.check_owner(request, name)
+
+        etag = self.get_etag(name)
+        if etag in [tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')]:
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(content_type=mimetypes.guess_type(name)[0] or 'application/octet-stream')
+            if SENDFILE_BACKEND == 'nginx':
+                response['X-Accel-Redirect'] = ACCEL_REDIRECT_PREFIX + quote(name)
+            else:
+                response['X-Sendfile'] = media_storage.path(name)
+            response['Accept-Ranges'] = 'bytes'
+
+        response['ETag'] = etag
+        if HASHED_NAME_RE.search(name):
+            patch_cache_control(response, max_age=ONE_YEAR, immutable=True,
+                                **{'private' if private else 'public': True})
+        else:
+            patch_cache_control(response, max_age=ONE_DAY, **{'private' if private else 'public': True})
+        return response
+
+    def is_public(self, name):
+        return Product.objects.filter(cover_image=name).exists() \
+            or ProductImage.objects.filter(image=name).exists()
+
+    def check_owner(self, request, name):
+        # One indexed lookup per image column, rather than an OR across them.
+        lookups = [
+            CustomOrder.objects.filter(**{field: name}).values_list('customer_id', flat=True).order_by()
+            for field in CUSTOM_ORDER_IMAGE_FIELDS
+        ]
+        owners = set(lookups[0].union(*lookups[1:]))
+        if not owners:
+            raise NotFound()
+        if not request.user.is_authenticated:
+            raise NotAuthenticated()
+        if request.user.is_staff:
+            return
+        try:
+            customer_id = get_customer_id(request.user)
+        except Customer.DoesNotExist:
+            raise NotFound()
+        if customer_id not in owners:
+            raise NotFound()
+
+    def get_etag(self, name):
+        match = HASHED_NAME_RE.search(name)
+        if match:
+            return f'"{match.group("digest")}"'
+        stat = os.stat(media_storage.path(name))
+        return f'"{int(stat.st_mtime):x}-{stat.st_size:x}"'
@@ -0,0 +1,207 @@
+import asyncio
+import json
+import math
+import re
+import threading
+import time
+from collections import deque
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse
+
+# Load shedding. Requests are sorted into classes (checkout, cart writes,
+# catalog reads, ...) with separate concurrency budgets, so a pile-up of
+# checkouts behind the database write lock cannot starve catalog reads. Each
+# class admits up to `limit` requests at once and queues a bounded number of
+# others; requests that would wait longer than the queue timeout are turned
+# away with 503 at once instead of timing out later. The limit adapts to the
+# measured latency: it grows by one per window of fast requests and shrinks
+# by a tenth whenever requests are slower than the target (AIMD). Under ASGI
+# queued requests await a future instead of holding a thread.
+
+
+class Overloaded(Exception):
+    pass
+
+
+class AdaptiveLimiter:
+    def __init__(self, name, initial_limit=8, min_limit=1, max_limit=64, max_queue=32,
+                 queue_timeout=0.5, target_latency=1.0):
+        self.name = name
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.target_latency = target_latency
+        self.in_flight = 0
+        self.waiting = 0
+        self.condition = threading.Condition()
+        # (event loop, future) of the requests queued by acquire_async().
+        self.async_waiters = deque()
+
+    def admit(self):
+        if self.in_flight < int(self.limit) and not self.waiting:
+            self.in_flight += 1
+            return True
+        if self.waiting >= self.max_queue:
+            raise Overloaded()
+        return False
+
+    def acquire(self):
+        with self.condition:
+            if self.admit():
+                return
+            self.waiting += 1
+            try:
+                deadline = time.monotonic() + self.queue_timeout
+                while self.in_flight >= int(self.limit):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.decrease()
+                        raise Overloaded()
+                    self.condition.wait(remaining)
+                self.in_flight += 1
+            finally:
+                self.waiting -= 1
+
+    async def acquire_async(self):
+        loop = asyncio.get_running_loop()
+        with self.condition:
+            if self.admit():
+                return
+            self.waiting += 1
+        try:
+            deadline = loop.time() + self.queue_timeout
+            while True:
+                with self.condition:
+                    if self.in_flight < int(self.limit):
+                        self.in_flight += 1
+                        return
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        self.decrease()
+                        raise Overloaded()
+                    future = loop.create_future()
+                    self.async_waiters.append((loop, future))
+                try:
+                    await asyncio.wait_for(future, remaining)
+                except asyncio.TimeoutError:
+                    pass
+                finally:
+                    with self.condition:
+                        if (loop, future) in self.async_waiters:
+                            self.async_waiters.remove((loop, future))
+        finally:
+            with self.condition:
+                self.waiting -= 1
+
+    def release(self, latency):
+        with self.condition:
+            self.in_flight -= 1
+            if latency > self.target_latency:
+                self.decrease()
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self.condition.notify()
+            self.wake_async_waiter()
+
+    def wake_async_waiter(self):
+        while self.async_waiters:
+            loop, future = self.async_waiters.popleft()
+            try:
+                loop.call_soon_threadsafe(wake, future)
+                return
+            except RuntimeError:
+                # The waiter's loop is closed.
+                continue
+
+    def decrease(self):
+        self.limit = max(self.min_limit, self.limit * 0.9)
+
+    def retry_after(self):
+        return max(1, math.ceil(self.target_latency * (self.waiting + 1) / max(self.limit, 1)))
+
+
+def wake(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class RequestClass:
+    def __init__(self, name, methods, paths, **limits):
+        self.name = name
+        self.methods = {method.upper() for method in methods}
+        self.paths = [re.compile(path) for path in paths]
+        self.limiter = AdaptiveLimiter(name, **limits)
+
+    def matches(self, request):
+        return request.method in self.methods and any(path.search(request.path_info) for path in self.paths)
+
+
+class LoadSheddingMiddleware:
+    """
+    Limits concurrency per request class, configured by LOAD_SHEDDING_CLASSES.
+    Requests of no class pass through untouched. Limits are per process.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        self.classes = [
+            RequestClass(name, **options)
+            for name, options in getattr(settings, 'LOAD_SHEDDING_CLASSES', {}).items()
+        ]
+
+    def request_class(self, request):
+        return next((request_class for request_class in self.classes if request_class.matches(request)), None)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        request_class = self.request_class(request)
+        if request_class is None:
+            return self.get_response(request)
+
+        limiter = request_class.limiter
+        try:
+            limiter.acquire()
+        except Overloaded:
+            return self.shed(limiter)
+
+        start = time.monotonic()
+        try:
+            return self.get_response(request)
+        finally:
+            limiter.release(time.monotonic() - start)
+
+    async def __acall__(self, request):
+        request_class = self.request_class(request)
+        if request_class is None:
+            return await self.get_response(request)
+
+        limiter = request_class.limiter
+        try:
+            await limiter.acquire_async()
+        except Overloaded:
+            return self.shed(limiter)
+
+        start = time.monotonic()
+        try:
+            return await self.get_response(request)
+        finally:
+            limiter.release(time.monotonic() - start)
+
+    def shed(self, limiter):
+        response = HttpResponse(
+            json.dumps({'error': 'The server is busy, please retry shortly.'}),
+            status=503,
+            content_type='application/json',
+        )
+        response['Retry-After'] = str(limiter.retry_after())
+        return response
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.6 on 2026-10-19 14:52
+
+import Store.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Store', '0017_alter_product_unit_price'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='customorder',
+            name='front_image',
+            field=models.ImageField(storage=Store.storage.ContentAddressedStorage(), upload_to=''),
+        ),
+        migrations.AlterField(
+            model_name='customorder',
+            name='left_side_image',
+            field=models.ImageField(blank=True, null=True, storage=Store.storage.ContentAddressedStorage(), upload_to=''),
+        ),
+        migrations.AlterField(
+            model_name='customorder',
+            name='rear_image',
+            field=models.ImageField(blank=True, null=True, storage=Store.storage.ContentAddressedStorage(), upload_to=''),
+        ),
+        migrations.AlterField(
+            model_name='customorder',
+            name='right_side_image',
+            field=models.ImageField(blank=True, null=True, storage=Store.storage.ContentAddressedStorage(), upload_to=''),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='cover_image',
+            field=models.ImageField(storage=Store.storage.ContentAddressedStorage(), upload_to='store/images'),
+        ),
+        migrations.AlterField(
+            model_name='productimage',
+            name='image',
+            field=models.ImageField(storage=Store.storage.ContentAddressedStorage(), upload_to='store/images'),
+        ),
+    ]
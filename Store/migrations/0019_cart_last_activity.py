@@ -0,0 +1,25 @@
+# Generated by Django 4.2.6 on 2026-10-19 14:54
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+def copy_created_at(apps, schema_editor):
+    Cart = apps.get_model('Store', 'Cart')
+    Cart.objects.update(last_activity=models.F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Store', '0018_content_addressed_media_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='last_activity',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(copy_created_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.6 on 2026-10-19 15:00
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_low_stock_products(apps, schema_editor):
+    Product = apps.get_model('Store', 'Product')
+    LowStockProduct = apps.get_model('Store', 'LowStockProduct')
+    threshold = settings.LOW_STOCK_THRESHOLD
+    LowStockProduct.objects.bulk_create(
+        [LowStockProduct(product_id=product_id, inventory=inventory, threshold=threshold)
+         for product_id, inventory in Product.objects.filter(inventory__lt=threshold).values_list('id', 'inventory')],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Store', '0021_daily_sales'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LowStockProduct',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='low_stock', serialize=False, to='Store.product')),
+                ('inventory', models.IntegerField()),
+                ('threshold', models.PositiveIntegerField()),
+                ('since', models.DateTimeField(auto_now_add=True)),
+                ('notified_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['inventory'],
+            },
+        ),
+        migrations.AddField(
+            model_name='collection',
+            name='low_stock_threshold',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='low_stock_threshold',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(fill_low_stock_products, migrations.RunPython.noop),
+    ]
@@ -2,11 +2,15 @@ from django.contrib import admin
 from django.conf import settings
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db import models
+from django.utils import timezone
 from uuid import uuid4
+from .db import bulk_upsert_add
+from .storage import media_storage
 
 
 class Collection(models.Model):
     title = models.CharField(max_length=255)
+    low_stock_threshold = models.PositiveIntegerField(null=True, blank=True)
 
     def __str__(self) -> str:
         return self.title
@@ -27,7 +31,8 @@ class Product(models.Model):
     inventory = models.IntegerField(validators=[MinValueValidator(0)])
     last_update = models.DateTimeField(auto_now=True)
     collection = models.ForeignKey(Collection, on_delete=models.PROTECT, related_name='products')
-    cover_image = models.ImageField(upload_to='store/images')
+    cover_image = models.ImageField(upload_to='store/images', storage=media_storage, db_index=True)
+    low_stock_threshold = models.PositiveIntegerField(null=True, blank=True)
 
 
     def __str__(self) -> str:
@@ -36,9 +41,21 @@ class Product(models.Model):
     class Meta:
         ordering = ['title']
 
+class LowStockProduct(models.Model):
+    """A product whose inventory is below its threshold, kept up to date by Store.inventory."""
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='low_stock')
+    inventory = models.IntegerField()
+    threshold = models.PositiveIntegerField()
+    since = models.DateTimeField(auto_now_add=True)
+    notified_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['inventory']
+
+
 class ProductImage(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE,related_name="images")
-    image = models.ImageField(upload_to='store/images')
+    image = models.ImageField(upload_to='store/images', storage=media_storage, db_index=True)
 
 class Customer(models.Model):
     MALE = 'M'
@@ -78,7 +95,7 @@ class Order(models.Model):
         (PAYMENT_STATUS_FAILED, 'Failed')
     ]
 
-    placed_at = models.DateTimeField(auto_now_add=True)
+    placed_at = models.DateTimeField(auto_now_add=True, db_index=True)
     payment_status = models.CharField(max_length=1, choices=PAYMENT_STATUS_CHOICES, default=PAYMENT_STATUS_PENDING)
     customer = models.ForeignKey(Customer, on_delete=models.PROTECT,related_name="orders")
 
@@ -96,9 +113,98 @@ class OrderItem(models.Model):
     quantity = models.PositiveSmallIntegerField()
     unit_price = models.DecimalField(max_digits=6, decimal_places=2)
 
+class ArchivedOrder(models.Model):
+    """An old order moved out of Order by Store.archive, keeping its id."""
+    id = models.BigIntegerField(primary_key=True)
+    placed_at = models.DateTimeField(db_index=True)
+    payment_status = models.CharField(max_length=1, choices=Order.PAYMENT_STATUS_CHOICES)
+    customer = models.ForeignKey(Customer, on_delete=models.PROTECT, related_name='archived_orders')
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+
+class ArchivedOrderItem(models.Model):
+    order = models.ForeignKey(ArchivedOrder, on_delete=models.CASCADE, related_name='items')
+    product = models.ForeignKey(Product, on_delete=models.PROTECT, related_name='+')
+    quantity = models.PositiveSmallIntegerField()
+    unit_price = models.DecimalField(max_digits=6, decimal_places=2)
+
+
+class ProductCooccurrence(models.Model):
+    """How many orders contained both products (stored in both directions)."""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    other = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = [['product', 'other']]
+
+
+class RelatedProduct(models.Model):
+    """The top products bought together with a product, served as is."""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='related_products')
+    related = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    score = models.PositiveIntegerField()
+
+    class Meta:
+        ordering = ['-score']
+        indexes = [models.Index(fields=['product', '-score'])]
+
+
+class DailySales(models.Model):
+    """Orders placed on a day, per payment status, kept up to date as orders change."""
+    day = models.DateField()
+    payment_status = models.CharField(max_length=1, choices=Order.PAYMENT_STATUS_CHOICES)
+    orders = models.IntegerField(default=0)
+    quantity = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = [['day', 'payment_status']]
+
+
+class DailyProductSales(models.Model):
+    """Sales of a product on a day, per payment status, kept up to date as orders change."""
+    day = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    collection = models.ForeignKey(Collection, on_delete=models.CASCADE, related_name='+')
+    payment_status = models.CharField(max_length=1, choices=Order.PAYMENT_STATUS_CHOICES)
+    orders = models.IntegerField(default=0)
+    quantity = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = [['day', 'product', 'payment_status']]
+        indexes = [models.Index(fields=['payment_status', 'day'])]
+
+
+class CartManager(models.Manager):
+    def touch(self, cart_id):
+        """Record activity on the cart without loading it."""
+        self.filter(pk=cart_id).update(last_activity=timezone.now())
+
+
 class Cart(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid4)
     created_at = models.DateTimeField(auto_now_add=True)
+    last_activity = models.DateTimeField(default=timezone.now, db_index=True)
+
+    objects = CartManager()
+
+
+class CartItemManager(models.Manager):
+    def add_quantities(self, cart_id, quantities):
+        """
+        Add `quantities` ({product_id: quantity}) to the items of the cart,
+        creating missing items, with a single INSERT ... ON CONFLICT statement.
+        """
+        bulk_upsert_add(
+            self.model,
+            [{'cart_id': cart_id, 'product_id': product_id, 'quantity': quantity}
+             for product_id, quantity in quantities.items()],
+            conflict_fields=['cart', 'product'],
+            add_fields=['quantity'],
+        )
+        Cart.objects.touch(cart_id)
 
 
 class CartItem(models.Model):
@@ -109,16 +215,18 @@ class CartItem(models.Model):
         validators=[MinValueValidator(1)]
     )
 
+    objects = CartItemManager()
+
     class Meta:
         unique_together = [['cart', 'product']]
 
 class CustomOrder(models.Model):
     customer = models.ForeignKey(Customer,on_delete=models.CASCADE)
     product_name = models.CharField(max_length=255)
-    left_side_image = models.ImageField(null=True, blank= True)
-    right_side_image = models.ImageField(null=True, blank= True)
-    front_image = models.ImageField()
-    rear_image = models.ImageField(null=True, blank= True)
+    left_side_image = models.ImageField(null=True, blank= True, storage=media_storage, db_index=True)
+    right_side_image = models.ImageField(null=True, blank= True, storage=media_storage, db_index=True)
+    front_image = models.ImageField(storage=media_storage, db_index=True)
+    rear_image = models.ImageField(null=True, blank= True, storage=media_storage, db_index=True)
     placed_at = models.DateTimeField(auto_now_add=True)
     description = models.TextField(null=True, blank=True)
 
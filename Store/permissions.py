@@ -1,4 +1,49 @@
+from django.conf import settings
+from django.core.cache import cache
 from rest_framework import permissions
+from FurnitureStore.caches import is_shared
+
+# Django caches a user's permissions on the user object, which lives for one
+# request. The sets are also kept in the default cache per user id and
+# permissions version, and the version is bumped whenever group memberships,
+# user permissions or group permissions change. Whether the user is active or
+# a superuser is read from the user of the request, not from the cache. A
+# version bumped in the local memory cache would not reach the other workers,
+# so without a shared default cache user.has_perms() is used as is.
+
+VERSION_KEY = 'permissions:version'
+
+
+def permissions_version():
+    return cache.get_or_set(VERSION_KEY, 0, None)
+
+
+def bump_permissions_version():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, 1, None)
+
+
+def cached_permissions(user):
+    """user.get_all_permissions(), cached across requests."""
+    key = f'permissions:{permissions_version()}:{user.pk}'
+    perms = cache.get(key)
+    if perms is None:
+        perms = frozenset(user.get_all_permissions())
+        cache.set(key, perms, getattr(settings, 'PERMISSION_CACHE_TIMEOUT', 300))
+    return perms
+
+
+def has_perms(user, perms):
+    """user.has_perms(perms) for the permissions granted through the authentication backends."""
+    if not is_shared():
+        return bool(user) and user.has_perms(perms)
+    if not user or not user.is_active:
+        return False
+    if user.is_superuser:
+        return True
+    return set(perms) <= cached_permissions(user)
 
 
 class IsAdminOrReadOnly(permissions.BasePermission):
@@ -12,6 +57,14 @@ class FullDjangoModelPermissions(permissions.DjangoModelPermissions):
     def __init__(self) -> None:
         self.perms_map['GET'] = ['%(app_label)s.view_%(model_name)s']
 
+    def has_permission(self, request, view):
+        if getattr(view, '_ignore_model_permissions', False):
+            return True
+        if not request.user or (not request.user.is_authenticated and self.authenticated_users_only):
+            return False
+        queryset = self._queryset(view)
+        return has_perms(request.user, self.get_required_permissions(request.method, queryset.model))
+
 class ViewCustomerHistoryPermission(permissions.BasePermission):
     def has_permission(self, request, view):
-        return request.user.has_perm('store.view_history')
\ No newline at end of file
+        return has_perms(request.user, ['store.view_history'])
@@ -0,0 +1,261 @@
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from django.conf import settings
+from django.contrib.auth import get_user_model, password_validation
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.core.exceptions import ValidationError
+from django.core.mail import get_connection
+from django.core.validators import validate_email
+from django.db import IntegrityError, connection, transaction
+from templated_mail.mail import BaseEmailMessage
+from .models import Customer
+
+# Bulk creation of users and their customers, e.g. for B2B accounts. Rows are
+# validated up front, passwords are hashed in a process pool (hashing takes
+# most of the time), and users and customers are written with bulk_create(),
+# so create_customer_for_new_user does not run once per row. The welcome
+# emails are sent afterwards as one job over a single mail connection.
+#
+# The API endpoint hashes in the web worker itself, one password at a time
+# (about a third of a second each), so it takes few rows; larger files go
+# through `manage.py provision_users`, which uses the process pool.
+
+logger = logging.getLogger(__name__)
+
+MAX_API_ROWS = 25
+BATCH_SIZE = 1000
+EMAIL_BATCH_SIZE = 100
+WELCOME_TEMPLATE = 'emails/welcome.html'
+# Below this many passwords, starting worker processes costs more than it saves.
+MIN_POOL_PASSWORDS = 16
+
+FIELD_LIMITS = {'username': 150, 'email': 254, 'first_name': 150, 'last_name': 150, 'phone_no': 10, 'password': 128}
+REQUIRED_FIELDS = ('username', 'email', 'first_name')
+
+username_validator = UnicodeUsernameValidator()
+
+
+def parse_row(row):
+    """Return (user fields, customer fields, password, errors) for one row."""
+    if not isinstance(row, dict):
+        return {}, {}, None, {'non_field_errors': 'Expected an object.'}
+    User = get_user_model()
+    errors = {}
+    values = {}
+    for name, limit in FIELD_LIMITS.items():
+        value = row.get(name)
+        if value in (None, ''):
+            if name in REQUIRED_FIELDS:
+                errors[name] = 'This field is required.'
+            continue
+        if not isinstance(value, str):
+            errors[name] = 'Not a valid string.'
+        elif len(value) > limit:
+            errors[name] = f'Ensure this field has no more than {limit} characters.'
+        else:
+            values[name] = value.strip() if name != 'password' else value
+
+    if 'username' in values:
+        values['username'] = User.normalize_username(values['username'])
+        try:
+            username_validator(values['username'])
+        except ValidationError as error:
+            errors['username'] = error.messages[0]
+    if 'email' in values:
+        values['email'] = User.objects.normalize_email(values['email'])
+        try:
+            validate_email(values['email'])
+        except ValidationError as error:
+            errors['email'] = error.messages[0]
+
+    customer = {}
+    if row.get('birth_date'):
+        try:
+            customer['birth_date'] = date.fromisoformat(str(row['birth_date']))
+        except ValueError:
+            errors['birth_date'] = 'Date has wrong format. Use YYYY-MM-DD.'
+    if row.get('gender'):
+        if row['gender'] in dict(Customer.GENDER_CHOICES):
+            customer['gender'] = row['gender']
+        else:
+            errors['gender'] = f"\"{row['gender']}\" is not a valid choice."
+
+    password = values.pop('password', None)
+    if password is not None and not errors:
+        try:
+            password_validation.validate_password(password, User(**values))
+        except ValidationError as error:
+            errors['password'] = error.messages
+    return values, customer, password, errors
+
+
+def existing(field, values):
+    User = get_user_model()
+    found = set()
+    values = list(values)
+    for start in range(0, len(values), BATCH_SIZE):
+        found.update(User.objects
+                     .filter(**{f'{field}__in': values[start:start + BATCH_SIZE]})
+                     .values_list(field, flat=True))
+    return found
+
+
+def hash_passwords(passwords, workers=None):
+    """make_password() for each password, None giving an unusable one."""
+    workers = workers or getattr(settings, 'PROVISIONING_WORKERS', 0) or os.cpu_count() or 1
+    hashed = [make_password(None) if password is None else None for password in passwords]
+    positions = [position for position, password in enumerate(passwords) if password is not None]
+    if workers == 1 or len(positions) < MIN_POOL_PASSWORDS:
+        for position in positions:
+            hashed[position] = make_password(passwords[position])
+        return hashed
+    chunk_size = max(1, min(64, len(positions) // (workers * 4)))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(make_password, [passwords[position] for position in positions], chunksize=chunk_size)
+        for position, password in zip(positions, results):
+            hashed[position] = password
+    return hashed
+
+
+def validate_rows(rows):
+    """
+    Check (line number, row) pairs. Returns the accepted rows, as (line number,
+    user fields, customer fields, password), and the errors of the others.
+    """
+    errors = []
+    valid = []
+    usernames = set()
+    emails = set()
+    for line, row in rows:
+        values, customer, password, row_errors = parse_row(row)
+        if not row_errors:
+            if values['username'] in usernames:
+                row_errors['username'] = 'Duplicate username in the file.'
+            if values['email'] in emails:
+                row_errors['email'] = 'Duplicate email in the file.'
+        if row_errors:
+            errors.append({'line': line, 'errors': row_errors})
+            continue
+        usernames.add(values['username'])
+        emails.add(values['email'])
+        valid.append((line, values, customer, password))
+
+    accepted, conflicts = exclude_taken(valid)
+    errors += conflicts
+    errors.sort(key=lambda error: error['line'])
+    return accepted, errors
+
+
+def exclude_taken(rows):
+    """Split (line, user fields, ...) rows into those still free and the errors of those taken by existing users."""
+    taken_usernames = existing('username', [values['username'] for _, values, *_ in rows])
+    taken_emails = existing('email', [values['email'] for _, values, *_ in rows])
+    free = []
+    errors = []
+    for row in rows:
+        line, values, _, _ = row
+        row_errors = {}
+        if values['username'] in taken_usernames:
+            row_errors['username'] = 'A user with that username already exists.'
+        if values['email'] in taken_emails:
+            row_errors['email'] = 'user with this email already exists.'
+        if row_errors:
+            errors.append({'line': line, 'errors': row_errors})
+        else:
+            free.append(row)
+    return free, errors
+
+
+def create_users(rows, batch_size):
+    User = get_user_model()
+    user_ids = []
+    with transaction.atomic():
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            users = User.objects.bulk_create([User(password=password, **values) for _, values, _, password in batch])
+            if any(user.pk is None for user in users):
+                # Backends that cannot return the ids of inserted rows (MySQL).
+                ids = dict(User.objects
+                           .filter(username__in=[user.username for user in users])
+                           .values_list('username', 'id'))
+                for user in users:
+                    user.pk = ids[user.username]
+            Customer.objects.bulk_create([
+                Customer(user_id=user.pk, **customer)
+                for user, (_, _, customer, _) in zip(users, batch)
+            ])
+            user_ids.extend(user.pk for user in users)
+    return user_ids
+
+
+def provision_users(rows, batch_size=BATCH_SIZE, workers=None):
+    """
+    Create a user and a customer for each valid (line number, row) pair.
+    Returns the ids of the new users and the errors of the skipped rows;
+    the valid rows are created together or not at all.
+    """
+    accepted, errors = validate_rows(rows)
+    if not accepted:
+        return [], errors
+
+    passwords = hash_passwords([password for _, _, _, password in accepted], workers)
+    rows = [(line, values, customer, password)
+            for (line, values, customer, _), password in zip(accepted, passwords)]
+    while rows:
+        try:
+            user_ids = create_users(rows, batch_size)
+            break
+        except IntegrityError:
+            # A username or email was taken since the rows were checked.
+            rows, conflicts = exclude_taken(rows)
+            if not conflicts:
+                raise
+            errors += conflicts
+    else:
+        user_ids = []
+    errors.sort(key=lambda error: error['line'])
+    return user_ids, errors
+
+
+def send_welcome_emails(user_ids, batch_size=EMAIL_BATCH_SIZE):
+    """Send the welcome email to the given users over one connection. Returns the number sent."""
+    User = get_user_model()
+    sent = 0
+    with get_connection() as mail_connection:
+        for start in range(0, len(user_ids), batch_size):
+            messages = []
+            for user in User.objects.filter(pk__in=user_ids[start:start + batch_size]).only('first_name', 'email'):
+                message = BaseEmailMessage(
+                    template_name=WELCOME_TEMPLATE,
+                    context={'name': user.first_name},
+                    to=[user.email],
+                    connection=mail_connection,
+                )
+                message.render()
+                messages.append(message)
+            sent += mail_connection.send_messages(messages) or 0
+    return sent
+
+
+def welcome_email_job(user_ids):
+    try:
+        logger.info('Sent %d welcome emails', send_welcome_emails(user_ids))
+    except Exception:
+        logger.exception('Sending welcome emails failed')
+    finally:
+        connection.close()
+
+
+def queue_welcome_emails(user_ids):
+    """Send the welcome emails from a background thread once the transaction commits."""
+    if not user_ids:
+        return
+
+    def start():
+        threading.Thread(target=welcome_email_job, args=(user_ids,), name='welcome_emails', daemon=True).start()
+
+    transaction.on_commit(start)
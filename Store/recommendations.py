@@ -0,0 +1,100 @@
+from collections import Counter
+from itertools import groupby, permutations
+from django.conf import settings
+from django.db import transaction
+from .db import bulk_upsert_add
+from .models import ArchivedOrderItem, OrderItem, ProductCooccurrence, RelatedProduct
+
+# "Frequently bought together": a sparse co-occurrence matrix of products over
+# orders, kept in ProductCooccurrence, and the top K entries of each row copied
+# to RelatedProduct so serving them is a single indexed lookup.
+
+TOP_K = getattr(settings, 'RELATED_PRODUCTS_TOP_K', 10)
+
+
+def order_pairs(product_ids):
+    return permutations(sorted(set(product_ids)), 2)
+
+
+def add_pair_counts(counts: Counter):
+    bulk_upsert_add(
+        ProductCooccurrence,
+        [{'product_id': product_id, 'other_id': other_id, 'count': count}
+         for (product_id, other_id), count in counts.items()],
+        conflict_fields=['product', 'other'],
+        add_fields=['count'],
+    )
+
+
+def refresh_related(product_ids, top_k=TOP_K):
+    """Recompute the top K related products of the given products."""
+    rows = []
+    for product_id in product_ids:
+        top = ProductCooccurrence.objects \
+            .filter(product_id=product_id) \
+            .order_by('-count', 'other_id') \
+            .values_list('other_id', 'count')[:top_k]
+        rows.extend(RelatedProduct(product_id=product_id, related_id=other_id, score=count)
+                    for other_id, count in top)
+    with transaction.atomic():
+        RelatedProduct.objects.filter(product_id__in=product_ids).delete()
+        RelatedProduct.objects.bulk_create(rows)
+
+
+def record_order(order_id):
+    """Add the products of a new order to the matrix and refresh their rows."""
+    product_ids = set(OrderItem.objects.filter(order_id=order_id).values_list('product_id', flat=True))
+    if len(product_ids) < 2:
+        return
+    add_pair_counts(Counter(order_pairs(product_ids)))
+    refresh_related(product_ids)
+
+
+def order_product_lists(chunk_size):
+    for model in (ArchivedOrderItem, OrderItem):
+        items = model.objects \
+            .order_by('order_id') \
+            .values_list('order_id', 'product_id') \
+            .iterator(chunk_size=chunk_size)
+        for _, rows in groupby(items, key=lambda row: row[0]):
+            yield [product_id for _, product_id in rows]
+
+
+def rebuild(chunk_size=10000, max_pairs=200000, top_k=TOP_K):
+    """
+    Rebuild the matrix and the top K table from every order, archived ones
+    included. Order lines are streamed and pair counts are flushed to the
+    database whenever `max_pairs` distinct pairs are pending, so memory stays
+    bounded however many orders there are. Everything runs in one transaction,
+    so readers keep the old tables until it commits, and the counts of orders
+    recorded meanwhile are not lost to the delete. Returns the number of
+    orders processed.
+    """
+    with transaction.atomic():
+        ProductCooccurrence.objects.all().delete()
+
+        orders = 0
+        counts = Counter()
+        for product_ids in order_product_lists(chunk_size):
+            orders += 1
+            counts.update(order_pairs(product_ids))
+            if len(counts) >= max_pairs:
+                add_pair_counts(counts)
+                counts.clear()
+        add_pair_counts(counts)
+
+        rows = []
+        rows_per_batch = chunk_size
+        pairs = ProductCooccurrence.objects \
+            .order_by('product_id', '-count', 'other_id') \
+            .values_list('product_id', 'other_id', 'count') \
+            .iterator(chunk_size=chunk_size)
+        RelatedProduct.objects.all().delete()
+        for product_id, group in groupby(pairs, key=lambda row: row[0]):
+            for _, other_id, count in list(group)[:top_k]:
+                rows.append(RelatedProduct(product_id=product_id, related_id=other_id, score=count))
+            if len(rows) >= rows_per_batch:
+                RelatedProduct.objects.bulk_create(rows)
+                rows = []
+        RelatedProduct.objects.bulk_create(rows)
+    return orders
@@ -0,0 +1,197 @@
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+from django.db import transaction
+from . import analytics
+from .models import ArchivedOrder, Order
+from .signals import order_status_changed
+
+# Payment reconciliation from settlement files. Rows are read as a stream and
+# handled a batch at a time: the orders of a batch are loaded with one
+# in_bulk() query, and each kind of status change is applied with one UPDATE
+# that only matches orders still in the status that was read, with the sales
+# rollups moved and the status events sent for the batch as a whole.
+
+BATCH_SIZE = 1000
+MAX_REPORTED = 1000
+RETRIES = 3
+OUTCOMES = ('updated', 'unchanged', 'unmatched', 'conflict', 'duplicate', 'invalid')
+
+STATUS_LABELS = dict(Order.PAYMENT_STATUS_CHOICES)
+STATUS_VALUES = {
+    **{code.lower(): code for code in STATUS_LABELS},
+    **{label.lower(): code for code, label in STATUS_LABELS.items()},
+    'paid': Order.PAYMENT_STATUS_COMPLETE,
+    'settled': Order.PAYMENT_STATUS_COMPLETE,
+    'declined': Order.PAYMENT_STATUS_FAILED,
+}
+TRANSITIONS = {
+    (Order.PAYMENT_STATUS_PENDING, Order.PAYMENT_STATUS_COMPLETE),
+    (Order.PAYMENT_STATUS_PENDING, Order.PAYMENT_STATUS_FAILED),
+}
+
+
+class ConcurrentChange(Exception):
+    pass
+
+
+def label(status):
+    return STATUS_LABELS.get(status, status)
+
+
+def parse_row(row):
+    """Return (order id, payment status, amount or None, errors) for one settlement row."""
+    if not isinstance(row, dict):
+        return None, None, None, {'non_field_errors': 'Expected an object.'}
+    errors = {}
+    order_id = row.get('order_id', row.get('id'))
+    if isinstance(order_id, str) and order_id.strip().isdigit():
+        order_id = int(order_id)
+    if isinstance(order_id, bool) or not isinstance(order_id, int):
+        errors['order_id'] = 'A valid integer is required.'
+        order_id = None
+
+    status = STATUS_VALUES.get(str(row.get('status', '')).strip().lower())
+    if status is None:
+        errors['status'] = f"\"{row.get('status', '')}\" is not a valid payment status."
+
+    amount = row.get('amount')
+    if amount in (None, ''):
+        amount = None
+    else:
+        try:
+            amount = Decimal(str(amount).strip())
+            if not amount.is_finite():
+                raise InvalidOperation
+        except InvalidOperation:
+            errors['amount'] = 'A valid number is required.'
+            amount = None
+    return order_id, status, amount, errors
+
+
+class Report:
+    """Counts per outcome, and the rows that were not applied."""
+
+    def __init__(self, max_reported=MAX_REPORTED):
+        self.counts = dict.fromkeys(OUTCOMES, 0)
+        self.problems = []
+        self.max_reported = max_reported
+
+    def add(self, line, order_id, outcome, detail=None):
+        self.counts[outcome] += 1
+        if outcome in ('updated', 'unchanged'):
+            return
+        if self.max_reported is None or len(self.problems) < self.max_reported:
+            self.problems.append({'line': line, 'order_id': order_id, 'outcome': outcome, 'detail': detail})
+
+    def problem_count(self):
+        return sum(count for outcome, count in self.counts.items() if outcome not in ('updated', 'unchanged'))
+
+    def as_dict(self):
+        return {**self.counts, 'problems': self.problems, 'problems_truncated': self.problem_count() > len(self.problems)}
+
+
+def reconcile_batch(batch, dry_run):
+    """Apply one batch of (line, order id, status, amount). Returns the outcome of each row."""
+    order_ids = [order_id for _, order_id, _, _ in batch]
+    orders = Order.objects.only('id', 'payment_status', 'placed_at', 'customer_id')
+    if not dry_run:
+        orders = orders.select_for_update()
+    orders = orders.in_bulk(order_ids)
+    missing = [order_id for order_id in order_ids if order_id not in orders]
+    archived = ArchivedOrder.objects.only('id', 'payment_status').in_bulk(missing) if missing else {}
+    # What each order adds to the sales rollups: its total for the amount
+    # check, and what to move once its status changes.
+    contributions = dict(zip(orders, analytics.OrderContribution.for_orders(list(orders.values()))))
+
+    outcomes = []
+    transitions = defaultdict(list)
+    for line, order_id, status, amount in batch:
+        order = orders.get(order_id)
+        if order is None:
+            archived_order = archived.get(order_id)
+            if archived_order is None:
+                outcomes.append((line, order_id, 'unmatched', 'No order with this id.'))
+            elif archived_order.payment_status == status:
+                outcomes.append((line, order_id, 'unchanged', None))
+            else:
+                outcomes.append((line, order_id, 'conflict',
+                                 f'The order is archived as {label(archived_order.payment_status)}.'))
+            continue
+
+        total = contributions[order_id].revenue()
+        if amount is not None and amount != total:
+            outcomes.append((line, order_id, 'conflict', f'The order total is {total}, not {amount}.'))
+        elif order.payment_status == status:
+            outcomes.append((line, order_id, 'unchanged', None))
+        elif (order.payment_status, status) not in TRANSITIONS:
+            outcomes.append((line, order_id, 'conflict',
+                             f'Cannot change a {label(order.payment_status)} order to {label(status)}.'))
+        else:
+            transitions[order.payment_status, status].append(order)
+            outcomes.append((line, order_id, 'updated', None))
+
+    if dry_run:
+        return outcomes
+    for (old_status, new_status), changed in transitions.items():
+        updated = Order.objects \
+            .filter(id__in=[order.id for order in changed], payment_status=old_status) \
+            .update(payment_status=new_status)
+        if updated != len(changed):
+            # Another writer changed some of these orders since they were read.
+            raise ConcurrentChange()
+        analytics.move_contributions([contributions[order.id] for order in changed], new_status)
+        for order in changed:
+            order_status_changed.send(sender=Order, order_id=order.id, customer_id=order.customer_id,
+                                      payment_status=new_status)
+    return outcomes
+
+
+def apply_batch(batch, report, dry_run):
+    for _ in range(RETRIES):
+        try:
+            with transaction.atomic():
+                outcomes = reconcile_batch(batch, dry_run)
+            break
+        except ConcurrentChange:
+            pass
+    else:
+        # The earlier batches are committed, so report this one and go on.
+        outcomes = [(line, order_id, 'conflict', 'The order was changed by another writer, try again.')
+                    for line, order_id, _, _ in batch]
+    for outcome in outcomes:
+        report.add(*outcome)
+
+
+def reconcile(rows, batch_size=BATCH_SIZE, dry_run=False, max_reported=MAX_REPORTED):
+    """
+    Apply the payment statuses of settlement (line number, row) pairs and
+    return a Report. Each row is 'updated', 'unchanged', 'unmatched' (no such
+    order), 'conflict' (a transition other than from Pending, a mismatching
+    amount, a second row for the order with another status, or a batch that
+    kept changing under it), 'duplicate' or 'invalid'. Batches are committed
+    one by one, so an interrupted run can simply be repeated.
+    """
+    report = Report(max_reported)
+    seen = {}
+    batch = []
+    for line, row in rows:
+        order_id, status, amount, errors = parse_row(row)
+        if errors:
+            report.add(line, order_id, 'invalid', errors)
+            continue
+        if order_id in seen:
+            first_status, first_line = seen[order_id]
+            if first_status == status:
+                report.add(line, order_id, 'duplicate', f'Same as line {first_line}.')
+            else:
+                report.add(line, order_id, 'conflict', f'Line {first_line} gives the order another status.')
+            continue
+        seen[order_id] = (status, line)
+        batch.append((line, order_id, status, amount))
+        if len(batch) >= batch_size:
+            apply_batch(batch, report, dry_run)
+            batch = []
+    if batch:
+        apply_batch(batch, report, dry_run)
+    report.problems.sort(key=lambda problem: problem['line'])
+    return report
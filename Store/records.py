@@ -0,0 +1,27 @@
+import csv
+import json
+
+# Reading the CSV and JSON Lines files taken by the bulk importers
+# (provisioning, payment reconciliation) one record at a time.
+
+
+def file_format(name):
+    """'csv' for .csv files, 'jsonl' otherwise."""
+    return 'csv' if name.lower().endswith('.csv') else 'jsonl'
+
+
+def read_rows(file, format):
+    """(line number, row) for each record of a CSV file with a header line or of a JSON Lines file."""
+    if format == 'csv':
+        reader = csv.DictReader(file)
+        for row in reader:
+            yield reader.line_num, {name: value for name, value in row.items() if name and value not in (None, '')}
+        return
+    for line_number, line in enumerate(file, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield line_number, row
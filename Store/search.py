@@ -0,0 +1,165 @@
+import re
+import threading
+from bisect import bisect_left
+from django.core.cache import cache
+from django.utils.text import slugify
+from .models import Collection, Product
+
+# In-process prefix index for autocomplete. Each worker keeps a sorted array of
+# search keys over product and collection titles and answers lookups with a
+# binary search. Changes bump a version in the shared cache and record what
+# changed, so other workers catch up by reloading just those rows.
+
+VERSION_KEY = 'autocomplete:version'
+CHANGE_KEY = 'autocomplete:change:{}'
+CHANGE_TIMEOUT = 24 * 60 * 60
+# A worker further behind than this rebuilds its index from scratch.
+MAX_CHANGES = 100
+# Keys a lookup walks at most; short prefixes match much of the index, and
+# once one kind is full the rest of its keys would only be skipped.
+MAX_SCANNED_KEYS = 1000
+
+PRODUCT = 'product'
+COLLECTION = 'collection'
+
+WORD_RE = re.compile(r'\w+')
+
+
+def normalize(text):
+    return ' '.join(WORD_RE.findall(text.casefold()))
+
+
+def title_keys(title):
+    """'Oak dining table' is found by prefixes of 'oak dining table', 'dining table' and 'table'."""
+    words = normalize(title).split()
+    return {' '.join(words[start:]) for start in range(len(words))}
+
+
+def product_entry(product):
+    return {
+        'id': product.id,
+        'title': product.title,
+        'slug': product.slug,
+        'thumbnail': product.cover_image.url if product.cover_image else None,
+    }
+
+
+def collection_entry(collection):
+    return {
+        'id': collection.id,
+        'title': collection.title,
+        'slug': slugify(collection.title),
+        'thumbnail': None,
+    }
+
+
+def load_entries(kind, ids=None):
+    if kind == PRODUCT:
+        queryset = Product.objects.only('id', 'title', 'slug', 'cover_image')
+        to_entry = product_entry
+    else:
+        queryset = Collection.objects.only('id', 'title')
+        to_entry = collection_entry
+    if ids is not None:
+        queryset = queryset.filter(pk__in=ids)
+    return {(kind, instance.id): to_entry(instance) for instance in queryset.iterator()}
+
+
+class PrefixIndex:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = None
+        # Replaced as a whole on every change, so lookups never see a
+        # half-updated index and need no lock.
+        self.state = ([], [], {})
+
+    def build(self, entries):
+        pairs = sorted(
+            (key, ref)
+            for ref, entry in entries.items()
+            for key in title_keys(entry['title'])
+        )
+        self.state = ([key for key, _ in pairs], [ref for _, ref in pairs], entries)
+
+    def rebuild(self, version):
+        entries = load_entries(PRODUCT)
+        entries.update(load_entries(COLLECTION))
+        self.build(entries)
+        self.version = version
+
+    def reload(self, refs):
+        entries = dict(self.state[2])
+        for kind in (PRODUCT, COLLECTION):
+            ids = {id for ref_kind, id in refs if ref_kind == kind}
+            if ids:
+                for id in ids:
+                    entries.pop((kind, id), None)
+                entries.update(load_entries(kind, ids))
+        self.build(entries)
+
+    def sync(self):
+        """Catch up with the changes made by other workers."""
+        version = cache.get(VERSION_KEY, 0)
+        if version == self.version:
+            return
+        with self.lock:
+            if version == self.version:
+                return
+            if self.version is None or version < self.version or version - self.version > MAX_CHANGES:
+                self.rebuild(version)
+                return
+            changes = cache.get_many([CHANGE_KEY.format(number) for number in range(self.version + 1, version + 1)])
+            if len(changes) < version - self.version:
+                self.rebuild(version)
+                return
+            self.reload({tuple(ref) for refs in changes.values() for ref in refs})
+            self.version = version
+
+    def lookup(self, query, limit=10):
+        """Products and collections whose title has a word starting with `query`."""
+        prefix = normalize(query)
+        results = {PRODUCT: [], COLLECTION: []}
+        if not prefix:
+            return results
+        keys, refs, entries = self.state
+        seen = set()
+        position = bisect_left(keys, prefix)
+        end = min(len(keys), position + MAX_SCANNED_KEYS)
+        while position < end and keys[position].startswith(prefix):
+            ref = refs[position]
+            position += 1
+            if ref in seen or len(results[ref[0]]) >= limit:
+                if all(len(items) >= limit for items in results.values()):
+                    break
+                continue
+            seen.add(ref)
+            results[ref[0]].append(entries[ref])
+        return results
+
+    def is_current(self, kind, entry):
+        """
+        Whether the index already holds `entry`, so saving it needs no update.
+        Called on save, so it never syncs: an index behind the shared version
+        cannot tell, and the change is recorded.
+        """
+        if self.version is None or cache.get(VERSION_KEY, 0) != self.version:
+            return False
+        return self.state[2].get((kind, entry['id'])) == entry
+
+
+index = PrefixIndex()
+
+
+def mark_changed(kind, ids):
+    """Record that products or collections changed, for every worker to reload them."""
+    try:
+        version = cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, 0, None)
+        version = cache.incr(VERSION_KEY)
+    cache.set(CHANGE_KEY.format(version), [(kind, id) for id in ids], CHANGE_TIMEOUT)
+
+
+def autocomplete(query, limit=10):
+    index.sync()
+    return index.lookup(query, limit)
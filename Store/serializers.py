@@ -1,10 +1,46 @@
+import csv
+import io
 from decimal import Decimal
-from django.db import transaction
+from itertools import islice
+from django.db import models, transaction
 from rest_framework import serializers
-from .models import Cart, CartItem, CustomOrder, Customer, Order, OrderItem, Product, Collection, ProductImage, WishList, WishListItem
-
-
-class CollectionSerializer(serializers.ModelSerializer):
+from rest_framework.permissions import SAFE_METHODS
+from .models import ArchivedOrder, ArchivedOrderItem, Cart, CartItem, CustomOrder, Customer, Order, OrderItem, Product, Collection, ProductImage, WishList, WishListItem
+from . import analytics, carts, catalog, provisioning, recommendations, records
+from .signals import order_status_changed, products_changed
+from .uploads import MAX_IMAGE_SIZE, MAX_OPEN_UPLOADS, ChunkedUpload
+
+
+def selected_fields(request, field_names):
+    """The names in `field_names` kept by the ?fields= and ?exclude= parameters of `request`."""
+    names = list(field_names)
+    if request is None or request.method not in SAFE_METHODS:
+        return names
+    fields = request.query_params.get('fields')
+    if fields:
+        keep = set(fields.split(','))
+        names = [name for name in names if name in keep]
+    exclude = request.query_params.get('exclude')
+    if exclude:
+        drop = set(exclude.split(','))
+        names = [name for name in names if name not in drop]
+    return names
+
+
+class DynamicFieldsMixin:
+    """Lets GET requests pick the fields of the response with ?fields=a,b or ?exclude=c."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is not None:
+            keep = set(selected_fields(request, self.fields))
+            for name in list(self.fields):
+                if name not in keep:
+                    self.fields.pop(name)
+
+
+class CollectionSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Collection
         fields = ['id', 'title', 'products_count']
@@ -12,7 +48,7 @@ class CollectionSerializer(serializers.ModelSerializer):
     products_count = serializers.IntegerField(read_only=True)
 
 
-class ProductImageSerializer(serializers.ModelSerializer):
+class ProductImageSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = ProductImage
         fields = ['id','image']
@@ -23,7 +59,7 @@ class ProductImageSerializer(serializers.ModelSerializer):
 
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     images = ProductImageSerializer(many=True)
     class Meta:
         model = Product
@@ -38,13 +74,50 @@ class ProductSerializer(serializers.ModelSerializer):
 
 
 
-class SimpleProductSerializer(serializers.ModelSerializer):
+class BulkUpdateProductSerializer(serializers.Serializer):
+    items = serializers.ListField(child=serializers.DictField(), allow_empty=False, max_length=catalog.MAX_ROWS)
+
+
+class ProvisionUsersSerializer(serializers.Serializer):
+    file = serializers.FileField(required=False, help_text='CSV with a header line, or JSON Lines.')
+    users = serializers.ListField(
+        child=serializers.DictField(), required=False, allow_empty=False, max_length=provisioning.MAX_API_ROWS)
+    send_welcome_email = serializers.BooleanField(default=True)
+
+    def validate(self, attrs):
+        upload = attrs.get('file')
+        if (upload is None) == ('users' not in attrs):
+            raise serializers.ValidationError('Provide either a file or a list of users.')
+        if upload is None:
+            attrs['rows'] = list(enumerate(attrs['users'], 1))
+            return attrs
+
+        try:
+            file = io.TextIOWrapper(upload.open('rb'), encoding='utf-8-sig', newline='')
+            rows = records.read_rows(file, records.file_format(upload.name))
+            rows = list(islice(rows, provisioning.MAX_API_ROWS + 1))
+        except (UnicodeDecodeError, csv.Error):
+            raise serializers.ValidationError({'file': 'Expected a UTF-8 encoded CSV or JSON Lines file.'})
+        if len(rows) > provisioning.MAX_API_ROWS:
+            raise serializers.ValidationError(
+                {'file': f'Ensure this file has no more than {provisioning.MAX_API_ROWS} rows.'})
+        attrs['rows'] = rows
+        return attrs
+
+
+class ReconcilePaymentsSerializer(serializers.Serializer):
+    file = serializers.FileField(help_text='Settlement file with order_id, status and optionally amount: '
+                                           'CSV with a header line, or JSON Lines.')
+    dry_run = serializers.BooleanField(default=False)
+
+
+class SimpleProductSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Product
         fields = ['id', 'title', 'unit_price','cover_image']
 
    
-class CartItemSerializer(serializers.ModelSerializer):
+class CartItemSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     product = SimpleProductSerializer()
     total_price = serializers.SerializerMethodField()
 
@@ -57,7 +130,7 @@ class CartItemSerializer(serializers.ModelSerializer):
         fields = ['id', 'product', 'quantity', 'total_price']
 
 
-class CartSerializer(serializers.ModelSerializer):
+class CartSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     id = serializers.UUIDField(read_only=True)
     items = CartItemSerializer(many=True, read_only=True)
     total_price = serializers.SerializerMethodField()
@@ -87,39 +160,38 @@ class RefreshCartSerializer(serializers.ModelSerializer):
         model = Cart
         fields = ['id', 'items', 'deleted_items','quantity_changed_items']
     
+def validate_cart_quantities(quantities):
+    """
+    Check {product_id: quantity} against the products table with one query and
+    return the error messages keyed by product id.
+    """
+    inventory = dict(Product.objects
+                     .filter(pk__in=quantities)
+                     .values_list('id', 'inventory'))
+    errors = {}
+    for product_id, quantity in quantities.items():
+        if product_id not in inventory:
+            errors[product_id] = {'product_id': ['No product with the given ID was found.']}
+        elif quantity > inventory[product_id]:
+            errors[product_id] = {'quantity': [f'quantity should be less or equal to {inventory[product_id]}']}
+    return errors
+
+
 class AddCartItemSerializer(serializers.ModelSerializer):
     product_id = serializers.IntegerField()
 
-    def validate_product_id(self, value):
-        if not Product.objects.filter(pk=value).exists():
-            raise serializers.ValidationError(
-                'No product with the given ID was found.')
-        
-        return value
-    
-    def validate_quantity(self,quantity):
-        if Product.objects.filter(pk = self.initial_data['product_id']).exists():
-            product = Product.objects.get(pk = self.initial_data['product_id'])
-            if quantity > product.inventory:
-                raise serializers.ValidationError(f'quantity should be less or equal to {product.inventory}')
-            
-        return quantity
+    def validate(self, attrs):
+        errors = validate_cart_quantities({attrs['product_id']: attrs['quantity']})
+        if errors:
+            raise serializers.ValidationError(errors[attrs['product_id']])
+        return attrs
 
     def save(self, **kwargs):
         cart_id = self.context['cart_id']
         product_id = self.validated_data['product_id']
-        quantity = self.validated_data['quantity']
-
-        try:
-            cart_item = CartItem.objects.get(
-                cart_id=cart_id, product_id=product_id)
-            cart_item.quantity += quantity
-            cart_item.save()
-            self.instance = cart_item
-        except CartItem.DoesNotExist:
-            self.instance = CartItem.objects.create(
-                cart_id=cart_id, **self.validated_data)
 
+        CartItem.objects.add_quantities(cart_id, {product_id: self.validated_data['quantity']})
+        self.instance = CartItem.objects.get(cart_id=cart_id, product_id=product_id)
         return self.instance
 
     class Meta:
@@ -127,23 +199,54 @@ class AddCartItemSerializer(serializers.ModelSerializer):
         fields = ['id', 'product_id', 'quantity']
 
 
+class CartItemQuantitySerializer(serializers.Serializer):
+    product_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1, max_value=32767)
+
+
+class BulkAddCartItemSerializer(serializers.Serializer):
+    items = CartItemQuantitySerializer(many=True, allow_empty=False)
+
+    def validate_items(self, items):
+        quantities = {}
+        for item in items:
+            quantities[item['product_id']] = quantities.get(item['product_id'], 0) + item['quantity']
+
+        errors = validate_cart_quantities(quantities)
+        if errors:
+            raise serializers.ValidationError([errors.get(item['product_id'], {}) for item in items])
+        return items
+
+    def save(self, **kwargs):
+        cart_id = self.context['cart_id']
+        quantities = {}
+        for item in self.validated_data['items']:
+            quantities[item['product_id']] = quantities.get(item['product_id'], 0) + item['quantity']
+
+        CartItem.objects.add_quantities(cart_id, quantities)
+        return CartItem.objects \
+            .filter(cart_id=cart_id, product_id__in=quantities) \
+            .select_related('product')
+
+
 class UpdateCartItemSerializer(serializers.ModelSerializer):
     def validate_quantity(self,quantity):
         if quantity > self.instance.product.inventory:
             raise serializers.ValidationError(f"quantity should be less or equal to {self.instance.product.inventory}")
+        return quantity
     class Meta:
         model = CartItem
         fields = ['quantity']
 
 
-class CustomerSerializer(serializers.ModelSerializer):
+class CustomerSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     user_id = serializers.IntegerField()
 
     class Meta:
         model = Customer
         fields = ['id', 'user_id', 'gender', 'birth_date']
 
-class OrderItemSerializer(serializers.ModelSerializer):
+class OrderItemSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     product = SimpleProductSerializer()
 
     class Meta:
@@ -151,7 +254,7 @@ class OrderItemSerializer(serializers.ModelSerializer):
         fields = ['id', 'product', 'unit_price', 'quantity']
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     items = OrderItemSerializer(many=True)
 
     class Meta:
@@ -159,16 +262,61 @@ class OrderSerializer(serializers.ModelSerializer):
         fields = ['id', 'customer', 'placed_at', 'payment_status', 'items']
 
 
+class ArchivedOrderItemSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    product = SimpleProductSerializer()
+
+    class Meta:
+        model = ArchivedOrderItem
+        fields = ['id', 'product', 'unit_price', 'quantity']
+
+
+class ArchivedOrderSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    items = ArchivedOrderItemSerializer(many=True)
+
+    class Meta:
+        model = ArchivedOrder
+        fields = ['id', 'customer', 'placed_at', 'payment_status', 'items']
+
+
+class OrderHistoryQuerySerializer(serializers.Serializer):
+    placed_after = serializers.DateTimeField(required=False)
+    placed_before = serializers.DateTimeField(required=False)
+    archived = serializers.BooleanField(required=False, allow_null=True, default=None)
+
+
 class UpdateOrderSerializer(serializers.ModelSerializer):
     class Meta:
         model = Order
         fields = ['payment_status']
 
+    def update(self, instance, validated_data):
+        old_payment_status = instance.payment_status
+        with transaction.atomic():
+            instance = super().update(instance, validated_data)
+            analytics.move_order(instance, old_payment_status)
+            if instance.payment_status != old_payment_status:
+                order_status_changed.send(sender=Order, order_id=instance.id, customer_id=instance.customer_id,
+                                          payment_status=instance.payment_status)
+        return instance
+
+
+class SalesQuerySerializer(serializers.Serializer):
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    payment_status = serializers.ChoiceField(choices=Order.PAYMENT_STATUS_CHOICES, required=False)
+
+    def validate(self, data):
+        if 'start' in data and 'end' in data and data['start'] > data['end']:
+            raise serializers.ValidationError('start must not be after end.')
+        return data
+
 
 class CreateOrderSerializer(serializers.Serializer):
     cart_id = serializers.UUIDField()
 
     def validate_cart_id(self, cart_id):
+        if carts.cache_enabled():
+            carts.materialize_cart(cart_id)
         if not Cart.objects.filter(pk=cart_id).exists():
             raise serializers.ValidationError(
                 'No cart with the given ID was found.')
@@ -180,10 +328,7 @@ class CreateOrderSerializer(serializers.Serializer):
         with transaction.atomic():
             cart_id = self.validated_data['cart_id']
 
-            customer = Customer.objects.get(
-                user_id=self.context['user_id'])
-            
-            order = Order.objects.create(customer=customer)
+            order = Order.objects.create(customer_id=self.context['customer_id'])
 
             cart_items = CartItem.objects \
                 .select_related('product') \
@@ -215,22 +360,90 @@ class CreateOrderSerializer(serializers.Serializer):
             if not order_items:
                 raise serializers.ValidationError('Empty Cart')
             OrderItem.objects.bulk_create(order_items)
+            analytics.record_order(order, order_items)
+            products_changed.send(sender=Product, product_ids=[item.product_id for item in order_items])
+            transaction.on_commit(lambda: recommendations.record_order(order.id))
 
             Cart.objects.filter(pk=cart_id).delete()
+            if carts.cache_enabled():
+                transaction.on_commit(lambda: carts.discard_cart(cart_id))
 
             return order
 
 
 
+class UploadedImageField(serializers.ImageField):
+    def to_internal_value(self, data):
+        # Files received through ImageUploadHandler or a chunked upload had their
+        # header checked on arrival, so skip Pillow's full verify() pass.
+        if not hasattr(data, 'image_format'):
+            return super().to_internal_value(data)
+        file_object = serializers.FileField.to_internal_value(self, data)
+        if data.image_format is None:
+            self.fail('invalid_image')
+        return file_object
+
+
 class CustomOrderSerializer(serializers.ModelSerializer):
+    IMAGE_FIELDS = ['left_side_image', 'right_side_image', 'front_image', 'rear_image']
+
+    serializer_field_mapping = {
+        **serializers.ModelSerializer.serializer_field_mapping,
+        models.ImageField: UploadedImageField,
+    }
+
+    left_side_image_upload = serializers.UUIDField(write_only=True, required=False)
+    right_side_image_upload = serializers.UUIDField(write_only=True, required=False)
+    front_image_upload = serializers.UUIDField(write_only=True, required=False)
+    rear_image_upload = serializers.UUIDField(write_only=True, required=False)
+
     class Meta:
         model = CustomOrder
-        fields = ['product_name','description','left_side_image','right_side_image','front_image','rear_image']
+        fields = ['product_name','description','left_side_image','right_side_image','front_image','rear_image',
+                  'left_side_image_upload','right_side_image_upload','front_image_upload','rear_image_upload']
+        extra_kwargs = {'front_image': {'required': False}}
+
+    def validate(self, attrs):
+        for field in self.IMAGE_FIELDS:
+            upload_id = attrs.pop(f'{field}_upload', None)
+            if upload_id is None:
+                continue
+            upload = ChunkedUpload.get(self.context['customer_id'], upload_id)
+            if upload is None or not upload.complete:
+                raise serializers.ValidationError({f'{field}_upload': 'No completed upload with the given ID was found.'})
+            attrs[field] = upload.as_file()
+
+        if not attrs.get('front_image'):
+            raise serializers.ValidationError({'front_image': 'This field is required.'})
+        return attrs
+
+    def create(self, validated_data):
+        custom_order = CustomOrder.objects.create(customer_id = self.context['customer_id'], **validated_data)
+        for field in self.IMAGE_FIELDS:
+            image = validated_data.get(field)
+            if hasattr(image, 'upload'):
+                image.close()
+                image.upload.delete()
+        return custom_order
+
+
+class ImageUploadSerializer(serializers.Serializer):
+    id = serializers.UUIDField(read_only=True)
+    filename = serializers.CharField(max_length=255)
+    size = serializers.IntegerField(min_value=1, max_value=MAX_IMAGE_SIZE)
+    offset = serializers.IntegerField(read_only=True)
+    complete = serializers.BooleanField(read_only=True)
+
+    def validate(self, attrs):
+        if ChunkedUpload.open_count(self.context['customer_id']) >= MAX_OPEN_UPLOADS:
+            raise serializers.ValidationError(
+                f'At most {MAX_OPEN_UPLOADS} uploads can be open at once. Complete or delete one first.')
+        return attrs
 
     def create(self, validated_data):
-        return CustomOrder.objects.create(customer_id = self.context['customer_id'], **validated_data) 
+        return ChunkedUpload.create(self.context['customer_id'], **validated_data)
 
-class GetCustomOrdreSerializer(serializers.ModelSerializer):
+class GetCustomOrdreSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
 
     class Meta:
         model = CustomOrder
@@ -238,14 +451,14 @@ class GetCustomOrdreSerializer(serializers.ModelSerializer):
 
 
 
-class WishListItemSerializer(serializers.ModelSerializer):
+class WishListItemSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     product = SimpleProductSerializer()
     class Meta:
         model = WishListItem
         fields = ['id', 'product']
 
 
-class WishListSerializer(serializers.ModelSerializer):
+class WishListSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     id = serializers.IntegerField(read_only=True)
     items = WishListItemSerializer(many=True, read_only=True)
 
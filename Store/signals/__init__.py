@@ -0,0 +1,9 @@
+from django.dispatch import Signal
+
+# Sent with `product_ids` after the inventory or the low-stock threshold of
+# products changed, including through queryset updates that skip post_save.
+products_changed = Signal()
+
+# Sent with `order_id`, `customer_id` and `payment_status` after the payment
+# status of an order changed.
+order_status_changed = Signal()
@@ -1,8 +1,14 @@
 from django.conf import settings
-from django.db.models.signals import post_save
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver
 from django.http import BadHeaderError
-from Store.models import CustomOrder, Customer, Order
+from Store.inventory import refresh_low_stock
+from Store import events, facets, permissions, search
+from Store.models import Collection, CustomOrder, Customer, Order, Product
+from Store.signals import order_status_changed, products_changed
 from django.core.mail import send_mail
 from templated_mail.mail import BaseEmailMessage
 
@@ -53,3 +59,55 @@ def send_wait_email(sender, **kwargs):
       message.send([user.email])
     except BadHeaderError:
       pass
+
+
+@receiver(products_changed)
+def update_low_stock(sender, product_ids, **kwargs):
+  refresh_low_stock(product_ids)
+
+
+@receiver(post_save, sender=Product)
+def update_product_autocomplete(sender, instance, **kwargs):
+  if not search.index.is_current(search.PRODUCT, search.product_entry(instance)):
+    transaction.on_commit(lambda: search.mark_changed(search.PRODUCT, [instance.id]))
+
+
+@receiver(post_save, sender=Collection)
+def update_collection_autocomplete(sender, instance, **kwargs):
+  if not search.index.is_current(search.COLLECTION, search.collection_entry(instance)):
+    transaction.on_commit(lambda: search.mark_changed(search.COLLECTION, [instance.id]))
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Collection)
+def remove_from_autocomplete(sender, instance, **kwargs):
+  kind = search.PRODUCT if sender is Product else search.COLLECTION
+  transaction.on_commit(lambda: search.mark_changed(kind, [instance.id]))
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Collection)
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Collection)
+@receiver(products_changed)
+def invalidate_facets(sender, **kwargs):
+  transaction.on_commit(facets.bump_catalog_version)
+
+
+@receiver(order_status_changed)
+def publish_order_status(sender, order_id, customer_id, payment_status, **kwargs):
+  transaction.on_commit(lambda: events.publish_status(customer_id, order_id, payment_status))
+
+
+@receiver(m2m_changed, sender=get_user_model().groups.through)
+@receiver(m2m_changed, sender=get_user_model().user_permissions.through)
+@receiver(m2m_changed, sender=Group.permissions.through)
+def invalidate_permissions(sender, action, **kwargs):
+  if action in ('post_add', 'post_remove', 'post_clear'):
+    transaction.on_commit(permissions.bump_permissions_version)
+
+
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=Permission)
+def invalidate_permissions_on_delete(sender, **kwargs):
+  transaction.on_commit(permissions.bump_permissions_version)
@@ -0,0 +1,71 @@
+import hashlib
+import os
+import posixpath
+import re
+import tempfile
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+HASHED_NAME_RE = re.compile(r'(^|/)(?P<prefix>[0-9a-f]{2})/(?P<digest>[0-9a-f]{64})(\.\w+)?$')
+
+
+def content_hash(content):
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hashed_name(name, digest):
+    directory, filename = posixpath.split(name.replace('\\', '/'))
+    extension = os.path.splitext(filename)[1].lower()
+    return posixpath.join(directory, digest[:2], digest + extension)
+
+
+def is_hashed_name(name):
+    match = HASHED_NAME_RE.search(name)
+    return bool(match) and match.group('digest').startswith(match.group('prefix'))
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File system storage that names files after the SHA-256 of their content.
+
+    Uploading a file whose content is already stored returns the existing name
+    instead of writing a copy, and since a name always refers to the same
+    bytes, URLs served from this storage can be cached forever.
+    """
+    immutable = True
+
+    def get_available_name(self, name, max_length=None):
+        # The final name is only known once the content is hashed in _save, and
+        # an existing file with that name is the file we want.
+        return name
+
+    def _save(self, name, content):
+        name = hashed_name(name, content_hash(content))
+        if self.exists(name):
+            return name
+
+        full_path = self.path(name)
+        directory = os.path.dirname(full_path)
+        os.makedirs(directory, exist_ok=True)
+
+        # Concurrent uploads of the same content race to the same path, which is
+        # harmless: they hold identical bytes, so the last rename simply wins.
+        if hasattr(content, 'temporary_file_path'):
+            file_move_safe(content.temporary_file_path(), full_path, allow_overwrite=True)
+        else:
+            with tempfile.NamedTemporaryFile(dir=directory, delete=False) as temporary:
+                for chunk in content.chunks():
+                    temporary.write(chunk)
+            os.replace(temporary.name, full_path)
+
+        if self.file_permissions_mode is not None:
+            os.chmod(full_path, self.file_permissions_mode)
+        return name
+
+
+media_storage = ContentAddressedStorage()
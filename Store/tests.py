@@ -1,3 +1,82 @@
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.utils import timezone
+from . import analytics, reconciliation
+from .models import Collection, DailyProductSales, DailySales, Order, OrderItem, Product
 
-# Create your tests here.
+
+def rollups():
+    return (
+        sorted(DailySales.objects.values_list('day', 'payment_status', 'orders', 'quantity', 'revenue')),
+        sorted(DailyProductSales.objects.values_list(
+            'day', 'product_id', 'collection_id', 'payment_status', 'orders', 'quantity', 'revenue')),
+    )
+
+
+class ReconcileTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = get_user_model().objects.create_user('buyer', 'buyer@example.com', 'pw123456xx')
+        chairs = Collection.objects.create(title='Chairs')
+        tables = Collection.objects.create(title='Tables')
+        products = [
+            Product.objects.create(title='Chair', slug='chair', unit_price=Decimal('20.00'), inventory=10,
+                                   collection=chairs, cover_image='store/images/chair.png'),
+            Product.objects.create(title='Table', slug='table', unit_price=Decimal('150.00'), inventory=10,
+                                   collection=tables, cover_image='store/images/table.png'),
+        ]
+        now = timezone.now()
+        cls.orders = []
+        for index in range(6):
+            order = Order.objects.create(customer=user.customer)
+            Order.objects.filter(pk=order.pk).update(placed_at=now - timedelta(days=index % 3))
+            for product in products[:index % 2 + 1]:
+                OrderItem.objects.create(order=order, product=product, quantity=index + 1,
+                                         unit_price=product.unit_price)
+            cls.orders.append(order)
+        analytics.rebuild()
+
+    def total(self, order):
+        return sum(item.quantity * item.unit_price for item in order.items.all())
+
+    def test_rollups_match_rebuild(self):
+        first, second, third, fourth = self.orders[:4]
+        rows = [
+            {'order_id': first.id, 'status': 'paid', 'amount': str(self.total(first))},
+            {'order_id': second.id, 'status': 'Failed'},
+            {'order_id': third.id, 'status': 'A', 'amount': '1.00'},
+            {'order_id': fourth.id, 'status': 'settled'},
+            {'order_id': fourth.id, 'status': 'settled'},
+            {'order_id': 999999, 'status': 'paid'},
+        ]
+        report = reconciliation.reconcile(enumerate(rows, 1), batch_size=2)
+
+        self.assertEqual(report.counts, {'updated': 3, 'unchanged': 0, 'unmatched': 1, 'conflict': 1,
+                                         'duplicate': 1, 'invalid': 0})
+        incremental = rollups()
+        analytics.rebuild()
+        self.assertEqual(incremental, rollups())
+
+    def test_concurrent_change_is_reported(self):
+        first, second, third = self.orders[:3]
+        rows = [{'order_id': order.id, 'status': 'paid'} for order in (first, second, third)]
+        reconcile_batch = reconciliation.reconcile_batch
+
+        def change_second_batch(batch, dry_run):
+            if batch[0][1] == third.id:
+                raise reconciliation.ConcurrentChange()
+            return reconcile_batch(batch, dry_run)
+
+        with mock.patch.object(reconciliation, 'reconcile_batch', side_effect=change_second_batch):
+            report = reconciliation.reconcile(enumerate(rows, 1), batch_size=2)
+
+        self.assertEqual(report.counts['updated'], 2)
+        self.assertEqual(report.counts['conflict'], 1)
+        self.assertEqual(report.problems[0]['order_id'], third.id)
+        self.assertEqual(Order.objects.get(pk=third.pk).payment_status, Order.PAYMENT_STATUS_PENDING)
+        incremental = rollups()
+        analytics.rebuild()
+        self.assertEqual(incremental, rollups())
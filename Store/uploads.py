@@ -0,0 +1,270 @@
+import json
+import os
+import tempfile
+import time
+from uuid import UUID, uuid4
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+from django.http.multipartparser import MultiPartParserError
+from PIL import Image
+from rest_framework.exceptions import APIException, ParseError
+from rest_framework.parsers import MultiPartParser
+
+# Images sent with custom orders are streamed to disk inside MEDIA_ROOT as they
+# arrive, so saving the model is a rename instead of a copy, and they are
+# validated by letting Pillow parse the header only (no pixel decoding).
+# Resumable uploads are limited per customer and deleted once untouched for
+# IMAGE_UPLOAD_EXPIRY_HOURS, so partial files cannot fill the disk.
+
+MAX_IMAGE_SIZE = getattr(settings, 'IMAGE_UPLOAD_MAX_FILE_SIZE', 10 * 2**20)
+MAX_REQUEST_SIZE = getattr(settings, 'IMAGE_UPLOAD_MAX_TOTAL_SIZE', 25 * 2**20)
+MAX_OPEN_UPLOADS = getattr(settings, 'IMAGE_UPLOAD_MAX_OPEN', 8)
+UPLOAD_EXPIRY = getattr(settings, 'IMAGE_UPLOAD_EXPIRY_HOURS', 24) * 60 * 60
+ALLOWED_IMAGE_FORMATS = {'JPEG', 'PNG', 'GIF', 'WEBP'}
+UPLOAD_CHUNK_SIZE = 64 * 2**10
+
+
+def upload_dir(*parts):
+    path = os.path.join(settings.MEDIA_ROOT, 'uploads', *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def identify_image(path):
+    """
+    Return the Pillow format name of the image at `path`, or None when it is not
+    an image we accept. Only the header is read.
+    """
+    try:
+        with Image.open(path) as image:
+            image_format = image.format
+    except Exception:
+        return None
+    return image_format if image_format in ALLOWED_IMAGE_FORMATS else None
+
+
+class UploadTooLarge(MultiPartParserError):
+    pass
+
+
+class RequestTooLarge(APIException):
+    status_code = 413
+    default_detail = 'Upload too large.'
+    default_code = 'request_too_large'
+
+
+class ImageMultiPartParser(MultiPartParser):
+    """MultiPartParser answering 413 instead of 400 when an upload handler stops an upload for its size."""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return super().parse(stream, media_type, parser_context)
+        except ParseError as exc:
+            if isinstance(exc.__context__, UploadTooLarge):
+                raise RequestTooLarge(str(exc.__context__))
+            raise
+
+
+class MediaUploadedFile(UploadedFile):
+    """
+    An uploaded file written to a temporary location on the same filesystem as
+    the media storage, so FileSystemStorage can move it into place.
+    """
+
+    def __init__(self, name, content_type, size, charset, content_type_extra=None):
+        _, ext = os.path.splitext(name)
+        file = tempfile.NamedTemporaryFile(suffix='.upload' + ext, dir=upload_dir('tmp'))
+        super().__init__(file, name, content_type, size, charset, content_type_extra)
+        self.image_format = None
+
+    def temporary_file_path(self):
+        return self.file.name
+
+    def close(self):
+        try:
+            return self.file.close()
+        except FileNotFoundError:
+            # Already moved into storage.
+            pass
+
+
+class ImageUploadHandler(FileUploadHandler):
+    """
+    Stream multipart file uploads into media storage while enforcing per-file
+    and per-request size limits as the bytes arrive.
+    """
+    chunk_size = UPLOAD_CHUNK_SIZE
+
+    def __init__(self, request=None, max_file_size=MAX_IMAGE_SIZE, max_request_size=MAX_REQUEST_SIZE):
+        super().__init__(request)
+        self.max_file_size = max_file_size
+        self.max_request_size = max_request_size
+        self.received = 0
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        if content_length and content_length > self.max_request_size:
+            raise UploadTooLarge(f'Upload exceeds the limit of {self.max_request_size} bytes.')
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.file = MediaUploadedFile(
+            self.file_name, self.content_type, 0, self.charset, self.content_type_extra
+        )
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if start + len(raw_data) > self.max_file_size:
+            self.upload_interrupted()
+            raise UploadTooLarge(f'{self.file_name} exceeds the limit of {self.max_file_size} bytes.')
+        if self.received > self.max_request_size:
+            self.upload_interrupted()
+            raise UploadTooLarge(f'Upload exceeds the limit of {self.max_request_size} bytes.')
+        self.file.write(raw_data)
+
+    def file_complete(self, file_size):
+        self.file.flush()
+        self.file.seek(0)
+        self.file.size = file_size
+        self.file.image_format = identify_image(self.file.temporary_file_path())
+        return self.file
+
+    def upload_interrupted(self):
+        if hasattr(self, 'file'):
+            self.file.close()
+
+
+class ChunkedUpload:
+    """
+    A resumable upload assembled from sequential chunks, for clients on slow or
+    flaky connections. Each chunk is appended at the offset the client claims,
+    which must match what has been received so far.
+    """
+
+    def __init__(self, owner_id, upload_id: UUID):
+        self.owner_id = owner_id
+        self.id = upload_id
+        directory = upload_dir('partial', str(owner_id))
+        self.path = os.path.join(directory, f'{upload_id}.part')
+        self.meta_path = os.path.join(directory, f'{upload_id}.json')
+        with open(self.meta_path) as meta:
+            self.meta = json.load(meta)
+
+    @classmethod
+    def create(cls, owner_id, filename, size):
+        upload_id = uuid4()
+        directory = upload_dir('partial', str(owner_id))
+        open(os.path.join(directory, f'{upload_id}.part'), 'wb').close()
+        with open(os.path.join(directory, f'{upload_id}.json'), 'w') as meta:
+            json.dump({'filename': os.path.basename(filename), 'size': size, 'format': None}, meta)
+        return cls(owner_id, upload_id)
+
+    @classmethod
+    def open_count(cls, owner_id):
+        return sum(name.endswith('.json') for name in os.listdir(upload_dir('partial', str(owner_id))))
+
+    @classmethod
+    def get(cls, owner_id, upload_id):
+        try:
+            return cls(owner_id, UUID(str(upload_id)))
+        except (ValueError, FileNotFoundError):
+            return None
+
+    @property
+    def filename(self):
+        return self.meta['filename']
+
+    @property
+    def offset(self):
+        return os.path.getsize(self.path)
+
+    @property
+    def size(self):
+        return self.meta['size']
+
+    @property
+    def complete(self):
+        return self.offset == self.size and self.meta['format'] is not None
+
+    def append(self, stream):
+        """
+        Append the bytes of `stream` without exceeding the declared size.
+        Returns the new offset.
+        """
+        with open(self.path, 'ab') as part:
+            remaining = self.size - part.tell()
+            while True:
+                chunk = stream.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                if len(chunk) > remaining:
+                    raise UploadTooLarge(f'Chunk exceeds the declared size of {self.size} bytes.')
+                part.write(chunk)
+                remaining -= len(chunk)
+
+        if self.offset == self.size:
+            self.meta['format'] = identify_image(self.path)
+            with open(self.meta_path, 'w') as meta:
+                json.dump(self.meta, meta)
+        return self.offset
+
+    def as_file(self):
+        """
+        Return the completed upload as an uploaded file that storage can move
+        into place.
+        """
+        return CompletedUpload(self)
+
+    def delete(self):
+        for path in (self.path, self.meta_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def remove_stale(paths, cutoff):
+    """Remove `paths` unless one was modified after `cutoff`. Returns whether they were removed."""
+    try:
+        if max(os.path.getmtime(path) for path in paths) >= cutoff:
+            return False
+    except FileNotFoundError:
+        return False
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+    return True
+
+
+def purge_stale_uploads(max_age=None):
+    """
+    Delete the resumable uploads untouched for `max_age` seconds, and the
+    temporary files left by interrupted requests. Returns the number of
+    uploads deleted.
+    """
+    cutoff = time.time() - (UPLOAD_EXPIRY if max_age is None else max_age)
+    deleted = 0
+    partial = upload_dir('partial')
+    for owner in os.listdir(partial):
+        directory = os.path.join(partial, owner)
+        uploads = {}
+        for name in os.listdir(directory):
+            uploads.setdefault(os.path.splitext(name)[0], []).append(os.path.join(directory, name))
+        deleted += sum(remove_stale(paths, cutoff) for paths in uploads.values())
+    temporary = upload_dir('tmp')
+    for name in os.listdir(temporary):
+        remove_stale([os.path.join(temporary, name)], cutoff)
+    return deleted
+
+
+class CompletedUpload(UploadedFile):
+    def __init__(self, upload: ChunkedUpload):
+        super().__init__(open(upload.path, 'rb'), upload.meta['filename'],
+                         Image.MIME.get(upload.meta['format']), upload.size, None)
+        self.upload = upload
+        self.image_format = upload.meta['format']
+
+    def temporary_file_path(self):
+        return self.upload.path
@@ -1,28 +1,44 @@
+from django.conf import settings
 from django.urls import path
 from django.urls.conf import include
 from rest_framework_nested import routers
-from . import views
+from . import async_views, views
 
 router = routers.DefaultRouter()
 router.register('products',views.ProductViewSet)
 router.register('collections', views.CollectionViewSet)
-router.register('carts', views.CartViewSet)
+if settings.CART_STORAGE == 'cache':
+    router.register('carts', views.CachedCartViewSet, basename='cart')
+else:
+    router.register('carts', views.CartViewSet)
 router.register('customers', views.CustomerViewSet)
 router.register('orders', views.OrderViewSet, basename='orders')
 router.register('custom-order',views.CustomOrderViewSet, basename='Custom Order')
+router.register('uploads', views.ImageUploadViewSet, basename='uploads')
 router.register('wishlists',views.WishListViewSet,basename='wishlists')
+router.register('sales', views.SalesViewSet, basename='sales')
 
 products_router = routers.NestedDefaultRouter(router, 'products', lookup='product')
 products_router.register('images',views.ProductImageViewSet,basename='product-images')
 
 carts_router = routers.NestedDefaultRouter(router, 'carts', lookup='cart')
-carts_router.register('items', views.CartItemViewSet, basename='cart-items')
+carts_router.register('items', views.CachedCartItemViewSet if settings.CART_STORAGE == 'cache' else views.CartItemViewSet, basename='cart-items')
 
 customer_router = routers.NestedDefaultRouter(router,'customers',lookup = 'customer')
 customer_router.register('wishlists',views.WishListViewSet, basename='customer-wishlists')
 
 wishlist_router = routers.NestedDefaultRouter(router,'wishlists',lookup='wishlist')
 wishlist_router.register('items',views.WishListItemViewSet,basename='wishlist-items')
+async_urlpatterns = [
+    path('async/products/', async_views.product_list, name='async-product-list'),
+    path('async/products/<int:pk>/', async_views.product_detail, name='async-product-detail'),
+    path('async/products/<int:product_pk>/images/', async_views.product_image_list, name='async-product-images-list'),
+    path('async/products/<int:product_pk>/images/<int:pk>/', async_views.product_image_detail, name='async-product-images-detail'),
+    path('async/collections/', async_views.collection_list, name='async-collection-list'),
+    path('async/collections/<int:pk>/', async_views.collection_detail, name='async-collection-detail'),
+    path('async/orders/events/', async_views.order_events, name='async-order-events'),
+]
+
 # URLConf
-urlpatterns = router.urls  + carts_router.urls + products_router.urls + customer_router.urls + wishlist_router.urls
+urlpatterns = [path('autocomplete/', views.AutocompleteView.as_view(), name='autocomplete')] + router.urls  + carts_router.urls + products_router.urls + customer_router.urls + wishlist_router.urls + async_urlpatterns
     
\ No newline at end of file
@@ -1,19 +1,30 @@
+import csv
+import io
 from Store.permissions import FullDjangoModelPermissions, IsAdminOrReadOnly, ViewCustomerHistoryPermission
 from Store.pagination import DefaultPagination
-from django.db.models import F
+from core.authentication import get_customer_id
+from django.db.models import F, Sum
 from django.db.models.aggregates import Count
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.decorators import action, permission_classes
+from rest_framework.exceptions import NotFound
 from rest_framework.filters import SearchFilter, OrderingFilter
+from rest_framework.parsers import FormParser, JSONParser
 from rest_framework.mixins import CreateModelMixin, DestroyModelMixin, RetrieveModelMixin, UpdateModelMixin, ListModelMixin
-from rest_framework.permissions import AllowAny, DjangoModelPermissions, DjangoModelPermissionsOrAnonReadOnly, IsAdminUser, IsAuthenticated
+from rest_framework.permissions import SAFE_METHODS, AllowAny, DjangoModelPermissions, DjangoModelPermissionsOrAnonReadOnly, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
-from rest_framework.viewsets import ModelViewSet, GenericViewSet
+from rest_framework.views import APIView
+from rest_framework.viewsets import ModelViewSet, GenericViewSet, ViewSet
 from rest_framework import status
+from . import archive, carts, catalog, facets, provisioning, reconciliation, records, search
 from .filters import ProductFilter
-from .models import Cart, CartItem, Collection, CustomOrder, Customer, Order, OrderItem, Product, ProductImage, WishList, WishListItem
-from .serializers import AddCartItemSerializer, CartItemSerializer, CartSerializer, CollectionSerializer, CreateOrderSerializer, CreateWishListItemSerializer, CustomerSerializer, CustomOrderSerializer, GetCustomOrdreSerializer, OrderSerializer, ProductImageSerializer, ProductSerializer, RefreshCartSerializer, SimpleProductSerializer, UpdateCartItemSerializer, UpdateOrderSerializer, WishListItemSerializer,WishListSerializer
+from .idempotency import IdempotentCreateMixin, idempotent
+from .models import ArchivedOrder, ArchivedOrderItem, Cart, CartItem, Collection, CustomOrder, Customer, DailyProductSales, DailySales, Order, OrderItem, Product, ProductImage, RelatedProduct, WishList, WishListItem
+from .signals import products_changed
+from .serializers import AddCartItemSerializer, ArchivedOrderSerializer, BulkAddCartItemSerializer, BulkUpdateProductSerializer, CartItemSerializer, CartSerializer, CollectionSerializer, CreateOrderSerializer, CreateWishListItemSerializer, CustomerSerializer, CustomOrderSerializer, GetCustomOrdreSerializer, ImageUploadSerializer, OrderHistoryQuerySerializer, OrderSerializer, ProductImageSerializer, ProductSerializer, ProvisionUsersSerializer, ReconcilePaymentsSerializer, RefreshCartSerializer, SalesQuerySerializer, SimpleProductSerializer, UpdateCartItemSerializer, UpdateOrderSerializer, WishListItemSerializer,WishListSerializer, selected_fields
+from .uploads import ChunkedUpload, ImageMultiPartParser, ImageUploadHandler, UploadTooLarge
 
 
 class ProductViewSet(ModelViewSet):
@@ -29,12 +40,87 @@ class ProductViewSet(ModelViewSet):
     def get_serializer_context(self):
         return {'request': self.request}
 
+    def get_queryset(self):
+        # Writes save the whole row (last_update is auto_now), so only reads
+        # load just the columns of the requested fields, and the images only
+        # when they are part of the response.
+        if self.request.method not in SAFE_METHODS:
+            return Product.objects.prefetch_related('images').all()
+        fields = set(selected_fields(self.request, ProductSerializer.Meta.fields))
+        queryset = Product.objects.all()
+        if 'images' in fields:
+            queryset = queryset.prefetch_related('images')
+        if 'price_with_tax' in fields:
+            fields.add('unit_price')
+        columns = [field.name for field in Product._meta.concrete_fields if field.name in fields]
+        return queryset.only(*columns) if columns else queryset.only('id')
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        if request.query_params.get('facets') in ('1', 'true'):
+            response.data['facets'] = facets.get_facets(self.filter_queryset(self.get_queryset()), request.query_params)
+        return response
+
+    @action(detail=False, methods=['POST'], url_path='bulk-update', permission_classes=[IsAdminUser])
+    @idempotent
+    def bulk_update(self, request):
+        serializer = BulkUpdateProductSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = catalog.update_products(serializer.validated_data['items'])
+        summary = {status: 0 for status in ('updated', 'unchanged', 'not_found', 'invalid')}
+        for result in results:
+            summary[result['status']] += 1
+        return Response({**summary, 'results': results})
+
+    def perform_create(self, serializer):
+        product = serializer.save()
+        products_changed.send(sender=Product, product_ids=[product.id])
+
+    def perform_update(self, serializer):
+        product = serializer.save()
+        products_changed.send(sender=Product, product_ids=[product.id])
+
+    @action(detail=True, methods=['GET'])
+    def related(self, request, pk):
+        self.get_object()
+        products = [
+            related_product.related
+            for related_product in RelatedProduct.objects
+                .filter(product_id=pk)
+                .select_related('related')
+                .order_by('-score')
+        ]
+        return Response(SimpleProductSerializer(products, many=True, context={'request': request}).data)
+
     def destroy(self, request, *args, **kwargs):
-        if OrderItem.objects.filter(product_id=kwargs['pk']).count() > 0:
+        if OrderItem.objects.filter(product_id=kwargs['pk']).exists() \
+                or ArchivedOrderItem.objects.filter(product_id=kwargs['pk']).exists():
             return Response({'error': 'Product cannot be deleted because it is associated with an order item.'}, status=status.HTTP_405_METHOD_NOT_ALLOWED)
 
         return super().destroy(request, *args, **kwargs)
 
+class AutocompleteView(APIView):
+    """Typeahead over product and collection titles, served from the in-process prefix index."""
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), 50)
+        except ValueError:
+            limit = 10
+        results = search.autocomplete(request.query_params.get('q', ''), limit)
+        return Response({
+            'products': [self.absolute(request, entry) for entry in results[search.PRODUCT]],
+            'collections': results[search.COLLECTION],
+        })
+
+    def absolute(self, request, entry):
+        if not entry['thumbnail']:
+            return entry
+        return {**entry, 'thumbnail': request.build_absolute_uri(entry['thumbnail'])}
+
+
 class ProductImageViewSet(ModelViewSet):
     serializer_class = ProductImageSerializer
     permission_classes=[IsAdminOrReadOnly]
@@ -57,7 +143,7 @@ class CollectionViewSet(ModelViewSet):
         return super().destroy(request, *args, **kwargs)
 
 
-class CartViewSet(CreateModelMixin,RetrieveModelMixin,DestroyModelMixin,GenericViewSet):
+class CartViewSet(IdempotentCreateMixin,CreateModelMixin,RetrieveModelMixin,DestroyModelMixin,GenericViewSet):
     
     @action(methods=['GET'],detail=True)
     def refresh(self,request,pk):
@@ -90,6 +176,8 @@ class CartViewSet(CreateModelMixin,RetrieveModelMixin,DestroyModelMixin,GenericV
         for cart_item in CartItem.objects.filter(cart_id = pk,product__inventory = 0):
                 cart_item.delete()
 
+        Cart.objects.touch(pk)
+
         cart = Cart.objects.get(pk = pk)
         serializer = RefreshCartSerializer(cart,context ={'deleted_items':deleted_items,'quantity_changed_items':quantity_changed_items})
         
@@ -100,7 +188,7 @@ class CartViewSet(CreateModelMixin,RetrieveModelMixin,DestroyModelMixin,GenericV
     serializer_class = CartSerializer
 
 
-class CartItemViewSet(ModelViewSet):
+class CartItemViewSet(IdempotentCreateMixin, ModelViewSet):
     http_method_names = ['get', 'post', 'patch', 'delete']
 
     def get_serializer_class(self):
@@ -113,11 +201,27 @@ class CartItemViewSet(ModelViewSet):
     def get_serializer_context(self):
         return {'cart_id': self.kwargs['cart_pk']}
 
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        Cart.objects.touch(self.kwargs['cart_pk'])
+
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        Cart.objects.touch(self.kwargs['cart_pk'])
+
     def get_queryset(self):
         return CartItem.objects \
             .filter(cart_id=self.kwargs['cart_pk']) \
             .select_related('product')
 
+    @action(detail=False, methods=['POST'])
+    @idempotent
+    def bulk(self, request, cart_pk):
+        serializer = BulkAddCartItemSerializer(data=request.data, context=self.get_serializer_context())
+        serializer.is_valid(raise_exception=True)
+        cart_items = serializer.save()
+        return Response(CartItemSerializer(cart_items, many=True).data, status=status.HTTP_201_CREATED)
+
 
 class CustomerViewSet(ModelViewSet):
     queryset = Customer.objects.all()
@@ -128,8 +232,7 @@ class CustomerViewSet(ModelViewSet):
 
     @action(detail=False, methods=['GET', 'PUT'], permission_classes=[IsAuthenticated])
     def me(self, request):
-        customer= Customer.objects.get(
-            user_id=request.user.id)
+        customer = Customer.objects.get(pk=get_customer_id(request.user))
         if request.method == 'GET':
             serializer = CustomerSerializer(customer)
             return Response(serializer.data)
@@ -138,14 +241,25 @@ class CustomerViewSet(ModelViewSet):
             serializer.is_valid(raise_exception=True)
             serializer.save()
             return Response(serializer.data)
+
+    @action(detail=False, methods=['POST'])
+    @idempotent
+    def provision(self, request):
+        serializer = ProvisionUsersSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        # No process pool inside a web worker.
+        user_ids, errors = provisioning.provision_users(serializer.validated_data['rows'], workers=1)
+        if serializer.validated_data['send_welcome_email']:
+            provisioning.queue_welcome_emails(user_ids)
+        return Response({'created': len(user_ids), 'invalid': len(errors), 'errors': errors})
         
 
-class WishListViewSet(CreateModelMixin,RetrieveModelMixin,DestroyModelMixin,GenericViewSet):
+class WishListViewSet(IdempotentCreateMixin,CreateModelMixin,RetrieveModelMixin,DestroyModelMixin,GenericViewSet):
     queryset = WishList.objects.prefetch_related('items__product').all()
     serializer_class = WishListSerializer
     
 
-class WishListItemViewSet(ModelViewSet):
+class WishListItemViewSet(IdempotentCreateMixin, ModelViewSet):
     http_method_names = ['get', 'post', 'patch', 'delete']
 
     def get_serializer_class(self):
@@ -158,9 +272,14 @@ class WishListItemViewSet(ModelViewSet):
     def get_serializer_context(self):
         return {'wishlist_id':self.kwargs['wishlist_pk']}
 
-class CustomOrderViewSet(CreateModelMixin,GenericViewSet):
+class CustomOrderViewSet(IdempotentCreateMixin,CreateModelMixin,GenericViewSet):
     queryset = CustomOrder.objects.all()
     permission_classes = [IsAuthenticated]
+    parser_classes = [JSONParser, FormParser, ImageMultiPartParser]
+
+    def initialize_request(self, request, *args, **kwargs):
+        request.upload_handlers = [ImageUploadHandler(request)]
+        return super().initialize_request(request, *args, **kwargs)
     
     def get_serializer_class(self):
         if self.request.method=='GET':
@@ -169,28 +288,104 @@ class CustomOrderViewSet(CreateModelMixin,GenericViewSet):
     
     
     def get_serializer_context(self):
-        customer = Customer.objects.get(user_id = self.request.user.id)
-        return {'customer_id':customer.id}
+        if getattr(self, 'swagger_fake_view', False):
+            return {}
+        return {'customer_id': get_customer_id(self.request.user)}
     
 
+class ImageUploadViewSet(GenericViewSet):
+    serializer_class = ImageUploadSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_serializer_context(self):
+        if getattr(self, 'swagger_fake_view', False):
+            return {}
+        return {'customer_id': get_customer_id(self.request.user)}
+
+    def get_queryset(self):
+        # Uploads are files rather than rows; get_object() finds them by id.
+        return None
+
+    def get_object(self):
+        upload = ChunkedUpload.get(get_customer_id(self.request.user), self.kwargs['pk'])
+        if upload is None:
+            raise NotFound()
+        return upload
+
+    @idempotent
+    def create(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    def retrieve(self, request, pk):
+        return Response(self.get_serializer(self.get_object()).data)
+
+    def partial_update(self, request, pk):
+        upload = self.get_object()
+        try:
+            offset = int(request.headers['Upload-Offset'])
+        except (KeyError, ValueError):
+            return Response({'error': 'The Upload-Offset header is required.'}, status=status.HTTP_400_BAD_REQUEST)
+        if offset != upload.offset:
+            return Response({'error': 'Upload-Offset does not match the received size.', 'offset': upload.offset}, status=status.HTTP_409_CONFLICT)
+
+        try:
+            if request.stream is not None:
+                upload.append(request.stream)
+        except UploadTooLarge as exc:
+            return Response({'error': str(exc), 'offset': upload.offset}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+        if upload.offset == upload.size and not upload.complete:
+            upload.delete()
+            return Response({'error': 'Upload a valid image. The file you uploaded was either not an image or a corrupted image.'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(self.get_serializer(upload).data)
+
+    def destroy(self, request, pk):
+        self.get_object().delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
 class OrderViewSet(ModelViewSet):
     http_method_names = ['get', 'post', 'patch', 'delete', 'head', 'options']
     
     def get_permissions(self):
-        if self.request.method in ['PATCH', 'DELETE']:
+        if self.request.method in ['PATCH', 'DELETE'] or self.action == 'reconcile':
             return [IsAdminUser()]
         return [IsAuthenticated()]
     
 
+    @idempotent
     def create(self, request, *args, **kwargs):
         serializer = CreateOrderSerializer(
             data=request.data,
-            context={'user_id': self.request.user.id})
+            context={'customer_id': get_customer_id(self.request.user)})
         serializer.is_valid(raise_exception=True)
         order = serializer.save()
         serializer = OrderSerializer(order)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['POST'])
+    @idempotent
+    def reconcile(self, request):
+        # The file is read as a stream and applied batch by batch, so a file
+        # that turns out to be malformed halfway leaves the earlier batches
+        # applied; sending it again once fixed is safe.
+        serializer = ReconcilePaymentsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        upload = serializer.validated_data['file']
+        try:
+            file = io.TextIOWrapper(upload.open('rb'), encoding='utf-8-sig', newline='')
+            report = reconciliation.reconcile(
+                records.read_rows(file, records.file_format(upload.name)),
+                dry_run=serializer.validated_data['dry_run'],
+            )
+        except (UnicodeDecodeError, csv.Error):
+            return Response({'file': ['Expected a UTF-8 encoded CSV or JSON Lines file.']},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return Response(report.as_dict())
+
     def get_serializer_class(self):
         if self.request.method == 'POST':
             return CreateOrderSerializer
@@ -198,12 +393,212 @@ class OrderViewSet(ModelViewSet):
             return UpdateOrderSerializer
         return OrderSerializer
 
-    def get_queryset(self):
+    def get_queryset(self, model=Order):
         user = self.request.user
+        queryset = model.objects.prefetch_related('items__product').order_by('id')
 
         if user.is_staff:
-            return Order.objects.all()
+            return queryset.all()
+        if getattr(self, 'swagger_fake_view', False):
+            return queryset.none()
+
+        return queryset.filter(customer_id=get_customer_id(user))
+
+    def list(self, request, *args, **kwargs):
+        # Archived orders are looked up unless the requested range starts
+        # after the archive horizon; ?archived=true/false forces either way.
+        serializer = OrderHistoryQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        query = serializer.validated_data
+        context = self.get_serializer_context()
+
+        orders = self.filter_placed_at(self.get_queryset(), query)
+        data = OrderSerializer(orders, many=True, context=context).data
+        archived = query['archived']
+        if archived is None:
+            archived = 'placed_after' not in query or query['placed_after'] < archive.archive_horizon()
+        if archived:
+            archived_orders = self.filter_placed_at(self.get_queryset(ArchivedOrder), query)
+            data = ArchivedOrderSerializer(archived_orders, many=True, context=context).data + data
+        return Response(data)
+
+    def filter_placed_at(self, queryset, query):
+        if 'placed_after' in query:
+            queryset = queryset.filter(placed_at__gte=query['placed_after'])
+        if 'placed_before' in query:
+            queryset = queryset.filter(placed_at__lt=query['placed_before'])
+        return queryset
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            return super().retrieve(request, *args, **kwargs)
+        except Http404:
+            order = get_object_or_404(self.get_queryset(ArchivedOrder), pk=kwargs['pk'])
+            return Response(ArchivedOrderSerializer(order, context=self.get_serializer_context()).data)
+
+
+class SalesViewSet(ViewSet):
+    """
+    Staff sales reports read from the daily rollups, filtered by ?start=,
+    ?end= (inclusive dates) and ?payment_status=.
+    """
+    permission_classes = [IsAdminUser]
+    totals = {'orders': Sum('orders'), 'quantity': Sum('quantity'), 'revenue': Sum('revenue')}
 
-        customer_id = Customer.objects.only(
-            'id').get(user_id=user.id)
-        return Order.objects.filter(customer_id=customer_id)
+    def filter(self, queryset):
+        serializer = SalesQuerySerializer(data=self.request.query_params)
+        serializer.is_valid(raise_exception=True)
+        query = serializer.validated_data
+        if 'start' in query:
+            queryset = queryset.filter(day__gte=query['start'])
+        if 'end' in query:
+            queryset = queryset.filter(day__lte=query['end'])
+        if 'payment_status' in query:
+            queryset = queryset.filter(payment_status=query['payment_status'])
+        return queryset
+
+    def list(self, request):
+        return Response(self.filter(DailySales.objects).aggregate(**self.totals))
+
+    @action(detail=False)
+    def daily(self, request):
+        rows = self.filter(DailySales.objects) \
+            .values('day') \
+            .annotate(**self.totals) \
+            .order_by('day')
+        return Response(rows)
+
+    @action(detail=False, url_path='payment-status')
+    def payment_status(self, request):
+        rows = self.filter(DailySales.objects) \
+            .values('payment_status') \
+            .annotate(**self.totals) \
+            .order_by('payment_status')
+        return Response(rows)
+
+    @action(detail=False)
+    def collections(self, request):
+        rows = self.filter(DailyProductSales.objects) \
+            .values('collection_id', title=F('collection__title')) \
+            .annotate(**self.totals) \
+            .order_by('-revenue')
+        return Response(rows)
+
+    @action(detail=False)
+    def products(self, request):
+        rows = self.filter(DailyProductSales.objects) \
+            .values('product_id', title=F('product__title')) \
+            .annotate(**self.totals) \
+            .order_by('-revenue')[:100]
+        return Response(rows)
+
+
+class CachedCartViewSet(ViewSet):
+    """
+    CartViewSet for CART_STORAGE = 'cache': same endpoints and payloads, with
+    carts kept in the cache until checkout.
+    """
+
+    def get_cart(self, pk):
+        cart = carts.get_cart(pk)
+        if cart is None:
+            raise NotFound()
+        return cart
+
+    @idempotent
+    def create(self, request):
+        cart = carts.create_cart()
+        return Response(CartSerializer(cart).data, status=status.HTTP_201_CREATED)
+
+    def retrieve(self, request, pk):
+        return Response(CartSerializer(self.get_cart(pk)).data)
+
+    def destroy(self, request, pk):
+        carts.delete_cart(self.get_cart(pk).id)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(methods=['GET'], detail=True)
+    def refresh(self, request, pk):
+        cart = self.get_cart(pk)
+        deleted_items = []
+        quantity_changed_items = []
+        for cart_item in list(cart.items):
+            product = cart_item.product
+            if product.inventory == 0:
+                deleted_items.append({'product': {'id': product.id, 'title': product.title}, 'quantity': cart_item.quantity})
+                cart.set_quantity(product.id, 0)
+            elif product.inventory < cart_item.quantity:
+                quantity_changed_items.append({'product': {'id': product.id, 'title': product.title}, 'quantity': cart_item.quantity})
+                cart.set_quantity(product.id, product.inventory)
+
+        if deleted_items or quantity_changed_items:
+            carts.save_cart(cart)
+        serializer = RefreshCartSerializer(cart, context={'deleted_items': deleted_items, 'quantity_changed_items': quantity_changed_items})
+        return Response(serializer.data)
+
+
+class CachedCartItemViewSet(ViewSet):
+    """CartItemViewSet for CART_STORAGE = 'cache'."""
+
+    def get_cart(self):
+        cart = carts.get_cart(self.kwargs['cart_pk'])
+        if cart is None:
+            raise NotFound()
+        return cart
+
+    def get_item(self, cart, pk):
+        try:
+            cart_item = cart.get_item(int(pk))
+        except ValueError:
+            cart_item = None
+        if cart_item is None:
+            raise NotFound()
+        return cart_item
+
+    def list(self, request, cart_pk):
+        return Response(CartItemSerializer(self.get_cart().items, many=True).data)
+
+    def retrieve(self, request, cart_pk, pk):
+        return Response(CartItemSerializer(self.get_item(self.get_cart(), pk)).data)
+
+    @idempotent
+    def create(self, request, cart_pk):
+        cart = self.get_cart()
+        serializer = AddCartItemSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        product_id = serializer.validated_data['product_id']
+        cart.add_quantities({product_id: serializer.validated_data['quantity']})
+        carts.save_cart(cart)
+        return Response({'id': product_id, 'product_id': product_id, 'quantity': cart.quantities[product_id]},
+                        status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['POST'])
+    @idempotent
+    def bulk(self, request, cart_pk):
+        cart = self.get_cart()
+        serializer = BulkAddCartItemSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        product_ids = set()
+        for item in serializer.validated_data['items']:
+            cart.add_quantities({item['product_id']: item['quantity']})
+            product_ids.add(item['product_id'])
+        carts.save_cart(cart)
+        cart_items = [cart_item for cart_item in cart.items if cart_item.id in product_ids]
+        return Response(CartItemSerializer(cart_items, many=True).data, status=status.HTTP_201_CREATED)
+
+    def partial_update(self, request, cart_pk, pk):
+        cart = self.get_cart()
+        cart_item = self.get_item(cart, pk)
+        serializer = UpdateCartItemSerializer(cart_item, data=request.data, partial=True)
+        serializer.is_valid(raise_exception=True)
+        if 'quantity' in serializer.validated_data:
+            cart_item.quantity = serializer.validated_data['quantity']
+            cart.set_quantity(cart_item.id, cart_item.quantity)
+            carts.save_cart(cart)
+        return Response(UpdateCartItemSerializer(cart_item).data)
+
+    def destroy(self, request, cart_pk, pk):
+        cart = self.get_cart()
+        cart.set_quantity(self.get_item(cart, pk).id, 0)
+        carts.save_cart(cart)
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,78 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+from FurnitureStore.caches import is_shared
+from Store.models import Customer
+
+CUSTOMER_ID_CLAIM = 'customer_id'
+USER_CACHE_TIMEOUT = getattr(settings, 'JWT_USER_CACHE_TIMEOUT', 60)
+
+
+def user_cache_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def invalidate_cached_user(user_id):
+    cache.delete(user_cache_key(user_id))
+
+
+def get_customer_id(user):
+    """
+    Return the id of the customer attached to `user`, using the id resolved at
+    authentication time when available.
+    """
+    customer_id = getattr(user, 'customer_id', None)
+    if customer_id is None:
+        customer_id = Customer.objects.only('id').get(user_id=user.id).id
+    return customer_id
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that resolves the user, and the id of their customer,
+    from a short-lived cache instead of querying the database on every request.
+
+    Cached entries are dropped whenever the user or their customer is saved or
+    deleted, so deactivation and password changes take effect immediately.
+    Without a shared default cache that would only hold in the process making
+    the change, so users are then read from the database every time.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        key = user_cache_key(user_id)
+        cached = is_shared()
+        user = cache.get(key) if cached else None
+        if user is None:
+            try:
+                user = self.user_model.objects.get(**{api_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist:
+                raise AuthenticationFailed(_('User not found'), code='user_not_found')
+
+            user.customer_id = validated_token.get(CUSTOMER_ID_CLAIM) or Customer.objects \
+                .filter(user_id=user.id) \
+                .values_list('id', flat=True) \
+                .first()
+            if cached and user.is_active:
+                cache.set(key, user, USER_CACHE_TIMEOUT)
+
+        if not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(
+                api_settings.REVOKE_TOKEN_CLAIM
+            ) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code='password_changed'
+                )
+
+        return user
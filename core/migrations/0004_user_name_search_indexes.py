@@ -0,0 +1,37 @@
+from django.db import migrations
+
+# The admin customer search uses istartswith, which compiles to a LIKE that a
+# plain index does not serve on SQLite (case-insensitive LIKE) or PostgreSQL
+# (UPPER(...) LIKE). These indexes match those expressions; MySQL's default
+# case-insensitive collations already use the plain indexes of 0003.
+INDEXES = {
+    'sqlite': '{column} COLLATE NOCASE',
+    'postgresql': '(UPPER({column}::text)) text_pattern_ops',
+}
+
+
+def create_indexes(apps, schema_editor):
+    expression = INDEXES.get(schema_editor.connection.vendor)
+    if expression is None:
+        return
+    for column in ('first_name', 'last_name'):
+        schema_editor.execute(
+            f'CREATE INDEX core_user_{column}_search ON core_user ({expression.format(column=column)})')
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor not in INDEXES:
+        return
+    for column in ('first_name', 'last_name'):
+        schema_editor.execute(f'DROP INDEX core_user_{column}_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_user_name_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
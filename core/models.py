@@ -6,3 +6,9 @@ class User(AbstractUser):
   email = models.EmailField(unique=True)
   phone_no = models.CharField(max_length=10)
   first_name = models.CharField(("first name"), max_length=150)
+
+  class Meta(AbstractUser.Meta):
+    indexes = [
+      models.Index(fields=['first_name', 'last_name']),
+      models.Index(fields=['last_name']),
+    ]
@@ -1,5 +1,7 @@
 from Store.models import Customer
 from djoser.serializers import UserSerializer as BaseUserSerializer, UserCreateSerializer as BaseUserCreateSerializer
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer as BaseTokenObtainPairSerializer
+from core.authentication import CUSTOMER_ID_CLAIM
 
 
 class UserCreateSerializer(BaseUserCreateSerializer):
@@ -13,3 +15,14 @@ class UserSerializer(BaseUserSerializer):
     class Meta(BaseUserSerializer.Meta):
         fields = ['id', 'username', 'email', 'first_name', 'last_name','phone_no']
         ref_name = 'user1'
+
+
+class TokenObtainPairSerializer(BaseTokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token[CUSTOMER_ID_CLAIM] = Customer.objects \
+            .filter(user_id=user.id) \
+            .values_list('id', flat=True) \
+            .first()
+        return token